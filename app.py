@@ -20,6 +20,7 @@ st.set_page_config(page_title="HFTS v0.9.9", page_icon="🛠️")
 def get_db():
     manager = DataManager()
     manager.seed_data([], [])
+    manager.start_maintenance() # One background thread per process
     return manager
 
 dm = get_db() 
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import duckdb
+
+# ai_cache.py
+# Persistent store of Gemini responses keyed by hash(model + prompt), in a
+# local DuckDB file so repeated parses and filters are answered locally even
+# after a restart or deploy. Bounded by entry count and total size (least
+# recently used entries go first); each entry carries its own expiry.
+
+DEFAULT_TTL = 7 * 24 * 3600 # Seconds. Prompts embed the tool data they use, so an edit already changes the key
+
+
+class ResponseStore:
+    def __init__(self, path="ai_cache.db", max_entries=5000, max_bytes=50_000_000, ttl=DEFAULT_TTL):
+        try:
+            self.con = duckdb.connect(path)
+        except duckdb.Error:
+            # Another process holds the file: keep a private in-memory store rather than no cache at all
+            self.con = duckdb.connect(":memory:")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock() # One connection, used by every session thread
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS ai_responses (
+                key VARCHAR PRIMARY KEY,
+                model VARCHAR,
+                response VARCHAR,
+                bytes BIGINT,
+                created_at TIMESTAMP,
+                expires_at TIMESTAMP,
+                last_used TIMESTAMP,
+                hits BIGINT
+            )
+        """)
+
+    @staticmethod
+    def key(prompt, model):
+        return hashlib.sha256(f"{model}\x00{prompt}".encode()).hexdigest()
+
+    def get(self, prompt, model):
+        """The stored response for this prompt and model, or None if missing or expired."""
+        key = self.key(prompt, model)
+        with self._lock:
+            row = self.con.execute("""
+                UPDATE ai_responses SET last_used = current_localtimestamp(), hits = hits + 1
+                WHERE key = ? AND expires_at > current_localtimestamp()
+                RETURNING response
+            """, [key]).fetchone()
+            if row is None: self.misses += 1
+            else: self.hits += 1
+        return row[0] if row else None
+
+    def put(self, prompt, model, response, ttl=None):
+        if not response: return # Errors and empty answers are never cached
+        key = self.key(prompt, model)
+        with self._lock:
+            self.con.execute("""
+                INSERT OR REPLACE INTO ai_responses
+                VALUES (?, ?, ?, strlen(?), current_localtimestamp(), current_localtimestamp() + to_seconds(?::BIGINT), current_localtimestamp(), 0)
+            """, [key, model, response, response, int(self.ttl if ttl is None else ttl)])
+            self._evict()
+
+    def _evict(self):
+        # Expired rows first, then least recently used beyond the entry and size ceilings
+        deleted = self.con.execute("""
+            DELETE FROM ai_responses WHERE expires_at <= current_localtimestamp() OR key IN (
+                SELECT key FROM (
+                    SELECT key, row_number() OVER w AS n, sum(bytes) OVER w AS total
+                    FROM ai_responses WINDOW w AS (ORDER BY last_used DESC, created_at DESC, key)
+                ) WHERE n > ? OR total > ?
+            ) RETURNING key
+        """, [self.max_entries, self.max_bytes]).fetchall()
+        self.evictions += len(deleted)
+
+    def clear(self):
+        with self._lock:
+            self.con.execute("DELETE FROM ai_responses")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self.con.execute("SELECT count(*), coalesce(sum(bytes), 0) FROM ai_responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries, "bytes": int(size), "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None, "evictions": self.evictions,
+        }
@@ -0,0 +1,116 @@
+import atexit
+import queue
+import threading
+import time
+import requests
+
+# alerts.py
+# Background Discord alert dispatcher. Callers enqueue and return immediately;
+# one worker thread posts to the webhook with timeouts, retries and rate
+# limiting, and folds bursts of the same event type into a single digest.
+
+DIGEST_LINES = 10          # Events listed in a digest before "...and N more"
+MAX_DESCRIPTION = 4000     # Discord caps embed descriptions at 4096 chars
+
+
+def format_alert(event_type, events):
+    """Builds the webhook payload for one event, or a digest for several of the same type."""
+    if len(events) == 1:
+        email, details = events[0]
+        return {"content": f"🚨 **{event_type}**", "embeds": [{"description": f"**User:** {email}\n**Details:** {details}"}]}
+    lines = [f"**User:** {email} | **Details:** {details}" for email, details in events[:DIGEST_LINES]]
+    if len(events) > DIGEST_LINES:
+        lines.append(f"...and {len(events) - DIGEST_LINES} more")
+    return {"content": f"🚨 **{event_type}** x{len(events)}", "embeds": [{"description": "\n".join(lines)[:MAX_DESCRIPTION]}]}
+
+
+class AlertDispatcher:
+    def __init__(self, webhook_url, max_queue=200, timeout=5, max_retries=3, backoff=1.0,
+                 min_interval=1.0, coalesce_window=2.0, post=requests.post):
+        self.webhook_url = webhook_url
+        self.timeout = timeout                  # Seconds per HTTP request
+        self.max_retries = max_retries
+        self.backoff = backoff                  # First retry delay; doubles each attempt
+        self.min_interval = min_interval        # Minimum seconds between posts
+        self.coalesce_window = coalesce_window  # Seconds to gather a burst before sending
+        self._post = post
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_post = 0.0
+        self.stats = {"queued": 0, "dropped": 0, "sent": 0, "failed": 0, "coalesced": 0}
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="discord-alerts", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, 5)
+
+    def _bump(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def submit(self, event_type, email, details):
+        """Queues an alert without blocking. Returns False if the queue is full and it was dropped."""
+        try:
+            self._queue.put_nowait((event_type, email, details))
+        except queue.Full:
+            self._bump("dropped")
+            return False
+        self._bump("queued")
+        return True
+
+    def flush(self, timeout=None):
+        """Waits until every queued alert has been sent or given up on. Returns True if drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline: return False
+            time.sleep(0.01)
+        return True
+
+    # --- Worker ---
+    def _collect_burst(self):
+        burst = [self._queue.get()]
+        deadline = time.monotonic() + self.coalesce_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try:
+                burst.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return burst
+
+    def _run(self):
+        while True:
+            burst = self._collect_burst()
+            groups = {}
+            for event_type, email, details in burst:
+                groups.setdefault(event_type, []).append((email, details))
+            for event_type, events in groups.items():
+                self._bump("coalesced", len(events) - 1)
+                self._deliver(format_alert(event_type, events))
+            for _ in burst:
+                self._queue.task_done()
+
+    def _deliver(self, payload):
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_post + self.min_interval - time.monotonic()
+            if wait > 0: time.sleep(wait)
+            self._last_post = time.monotonic()
+            retry_after = None
+            try:
+                resp = self._post(self.webhook_url, json=payload, timeout=self.timeout)
+                if resp.status_code < 400:
+                    self._bump("sent")
+                    return True
+                if resp.status_code == 429:
+                    # Discord tells us how long to back off
+                    try: retry_after = float(resp.json().get("retry_after", 0))
+                    except Exception: pass
+                elif resp.status_code < 500:
+                    break # Bad payload or revoked webhook; retrying won't help
+            except Exception:
+                pass # Timeouts, connection errors: retry
+            if attempt < self.max_retries:
+                time.sleep(max(delay, retry_after or 0))
+                delay *= 2
+        self._bump("failed")
+        return False
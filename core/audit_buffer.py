@@ -0,0 +1,84 @@
+import atexit
+import datetime
+import threading
+import time
+import uuid
+
+# audit_buffer.py
+# Write-behind buffer for audit_logs. Events are queued in memory and written
+# by a background thread in multi-row INSERTs, so logging never puts a
+# database round trip on the user's click.
+
+MAX_BATCH_ROWS = 500     # Rows per INSERT statement
+MAX_BACKLOG = 5000       # Events kept while the database is unreachable; oldest are dropped first
+
+
+class AuditBuffer:
+    def __init__(self, cursor, max_events=50, max_age=5.0):
+        self._cursor = cursor          # Callable returning a cursor context manager (DataManager.cursor)
+        self.max_events = max_events   # Flush once this many events are waiting...
+        self.max_age = max_age         # ...or the oldest has waited this many seconds
+        self.dropped = 0
+        self.last_error = None
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, event_type, email, details):
+        # Time zone aware, so the database stores it the way it stores current_timestamp (which the log filters use)
+        row = (str(uuid.uuid4()), datetime.datetime.now(datetime.timezone.utc), event_type, email, details)
+        with self._lock:
+            if not self._pending: self._oldest = time.monotonic()
+            self._pending.append(row)
+            full = len(self._pending) >= self.max_events
+        if full: self._wake.set()
+
+    def _due(self):
+        with self._lock:
+            if not self._pending: return False
+            return len(self._pending) >= self.max_events or time.monotonic() - self._oldest >= self.max_age
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self.max_age)
+            self._wake.clear()
+            if self._due(): self.flush()
+
+    def flush(self):
+        """Writes every buffered event now. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._oldest = None
+            if not batch: return 0
+            written = 0
+            try:
+                with self._cursor() as con:
+                    while written < len(batch):
+                        chunk = batch[written:written + MAX_BATCH_ROWS]
+                        placeholders = ", ".join(["(?, ?, ?, ?, ?)"] * len(chunk))
+                        con.execute(f"INSERT INTO audit_logs VALUES {placeholders}", [v for row in chunk for v in row])
+                        written += len(chunk)
+                self.last_error = None
+            except Exception as e:
+                # Put unwritten events back in front of anything logged meanwhile
+                self.last_error = str(e)
+                with self._lock:
+                    backlog = batch[written:] + self._pending
+                    self.dropped += max(0, len(backlog) - MAX_BACKLOG)
+                    self._pending = backlog[-MAX_BACKLOG:]
+                    self._oldest = time.monotonic()
+            return written
+
+    def close(self):
+        """Stops the background thread and writes whatever is left (also run at interpreter exit)."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=self.max_age + 1)
+        self.flush()
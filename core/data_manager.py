@@ -1,39 +1,158 @@
 import duckdb
+import logging
 import streamlit as st
 import pandas as pd
+import numpy as np
+import os
 import uuid
-import json
-import datetime
-import requests
 import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from .alerts import AlertDispatcher
+from .audit_buffer import AuditBuffer
+from .db_pool import CursorPool
+from .history import CHANGE_TYPE, DELTA_INSERT, TRACKED_COLUMNS, checkpoint_json, state_sql
+from .replica import ReadReplica, fetch_arrow
+from .retrieval import retriever
+from .scheduler import MaintenanceScheduler
+from .search import ToolSearchIndex
+from .snapshot import TableSnapshot
+
+logger = logging.getLogger(__name__)
+
+# --- SECONDARY INDEXES ---
+# Managed index set for the hot equality lookups: name -> (table, columns).
+# Created at startup (and on the read replica) and verified via duckdb_indexes().
+# DuckDB only uses an ART index for single-column point lookups that hit a small
+# fraction of the table. owner/status filters match too many rows and the
+# timestamp range scans (purge, session expiry, audit) are served by row-group
+# zonemaps, so indexes there only slow writes down (see scripts/bench_indexes.py).
+INDEXES = {
+    "idx_tools_borrower": ("tools", "borrower"),
+    "idx_history_tool": ("tool_history", "tool_id"),
+}
+
+def ensure_indexes(con, tables=None):
+    """Creates any missing managed index (optionally only for some tables) and returns the names still missing."""
+    wanted = {name: spec for name, spec in INDEXES.items() if tables is None or spec[0] in tables}
+    for name, (table, cols) in wanted.items():
+        con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+    existing = {r[0] for r in con.execute(
+        "SELECT index_name FROM duckdb_indexes() WHERE database_name = current_database()").fetchall()}
+    return sorted(set(wanted) - existing)
+
+# --- COLD TIER ---
+# Rows older than the hot window move to Parquet under ARCHIVE_DIR/<table>/year=/month=.
+# table -> (timestamp column, key column)
+TIERED_TABLES = {
+    "tool_history": ("change_date", "history_id"),
+    "audit_logs": ("timestamp", "log_id"),
+}
+
+def with_archive(con, table, archive_dir):
+    """SQL relation for a table plus its archived rows, or just the table if nothing was archived."""
+    if not archive_dir: return table
+    files = f"{archive_dir}/{table}/**/*.parquet".replace("'", "''")
+    if not con.execute("SELECT count(*) FROM glob(?)", [files]).fetchone()[0]: return table
+    key = TIERED_TABLES[table][1]
+    # Hot rows win, so a move interrupted between COPY and DELETE never shows twice
+    return f"""(
+        SELECT * FROM {table} UNION ALL BY NAME
+        SELECT * EXCLUDE (year, month) FROM read_parquet('{files}', hive_partitioning = true) a
+        WHERE NOT EXISTS (SELECT 1 FROM {table} h WHERE h.{key} = a.{key})
+    )"""
+
+# --- DISPLAY COLUMNS ---
+DUE_SOON_DAYS = 2
+
+def add_display_columns(tools):
+    """
+    Adds the derived columns the views show, vectorized over the whole frame:
+    Location Info, Display Status, Due In (days), Due Status and transportable.
+    """
+    df = tools.copy(deep=False)
+    stationary = df['is_stationary'].eq(True)
+    location = df['household'].fillna("").astype(str) + " (" + df['bin_location'].fillna("").astype(str) + ")"
+    df['Location Info'] = location.where(~stationary, location + " ⚓ [Fixed]")
+    borrowed = df['status'] == 'Borrowed'
+    df['Display Status'] = np.where(borrowed, "⛔ With " + df['borrower'].fillna("").astype(str), "✅ Available")
+    due_in = (pd.to_datetime(df['return_date']) - pd.Timestamp.now()).dt.days
+    df['Due In'] = due_in
+    df['Due Status'] = np.select(
+        [due_in < 0, due_in <= DUE_SOON_DAYS, due_in.notna()],
+        ["🔴 Overdue", "🟠 Due Soon", "🟢 On Track"], default=None
+    )
+    df['transportable'] = ~stationary
+    return df
 
 # --- CACHED HELPERS (Outside Class to avoid hashing 'self') ---
 # These functions handle the actual data fetching. 
-# The '_con' argument tells Streamlit "Don't try to hash the database connection".
+# The '_read' argument (a callable that leases a read cursor) tells Streamlit "Don't try to hash the database connection",
+# and only gets called on a cache miss. The 'version' argument is the table's generation counter (see DataManager.invalidate),
+# so a write to one table only misses the entries built from that table.
 
-@st.cache_data(ttl=300) # Cache for 5 minutes
-def _fetch_family_members(_con):
-    return _con.execute("SELECT * FROM family ORDER BY name").df()
+@st.cache_data(ttl=300, max_entries=8) # Cache for 5 minutes
+def _fetch_family_members(_read, version):
+    with _read() as con:
+        return con.execute("SELECT * FROM family ORDER BY name").df()
 
-@st.cache_data(ttl=60) # Cache for 60 seconds
-def _fetch_all_tools(_con):
-    return _con.execute("SELECT * FROM tools").df()
+@st.cache_data(ttl=60, max_entries=64)
+def _fetch_my_tools(_read, owner_name, version):
+    with _read() as con:
+        return con.execute("SELECT * FROM tools WHERE owner = ?", [owner_name]).df()
 
-@st.cache_data(ttl=60)
-def _fetch_my_tools(_con, owner_name):
-    return _con.execute("SELECT * FROM tools WHERE owner = ?", [owner_name]).df()
+@st.cache_data(ttl=60, max_entries=256)
+def _fetch_tool_history(_read, tool_id, version, archive_dir=None):
+    # One row per changed field; creates, checkpoints and deletes show as a single row without a field
+    with _read() as con:
+        return con.execute(f"""
+            SELECT changed_by, change_date, kind, c.field, c.old_value, c.new_value
+            FROM (
+                SELECT changed_by, change_date, coalesce(kind, 'checkpoint') AS kind,
+                       unnest(CASE WHEN kind = 'delta' THEN changes ELSE [NULL] END) AS c
+                FROM {with_archive(con, "tool_history", archive_dir)}
+                WHERE tool_id = ?
+            )
+            ORDER BY change_date DESC, c.field
+        """, [tool_id]).df()
 
-@st.cache_data(ttl=60)
-def _fetch_tool_history(_con, tool_id):
-    return _con.execute("""
-        SELECT changed_by, change_date, previous_state 
-        FROM tool_history 
-        WHERE tool_id = ? 
-        ORDER BY change_date DESC
-    """, [tool_id]).df()
+# Registry rebuilt from history; keyed on both tables since unchanged fields come from tools
+@st.cache_data(ttl=300, max_entries=16)
+def _fetch_tools_as_of(_read, ts, tools_version, history_version, archive_dir=None):
+    with _read() as con:
+        source = with_archive(con, "tool_history", archive_dir)
+        points = f"SELECT id AS tool_id, ?::TIMESTAMP AS ts FROM tools UNION SELECT DISTINCT tool_id, ?::TIMESTAMP FROM {source} WHERE change_date > ?"
+        return con.execute(f"""
+            SELECT tool_id AS id, {', '.join(TRACKED_COLUMNS)} FROM ({state_sql(points, source=source)})
+            WHERE exists_at ORDER BY name
+        """, [ts, ts, ts]).df()
 
 class DataManager:
+    # Tables with their own cache generation counter
+    CACHED_TABLES = ("tools", "family", "history", "sessions")
+    # Seconds a resolved session token is trusted before re-checking the DB
+    SESSION_CACHE_TTL = 300
+    SESSION_CACHE_MAX = 1000
+    # Days rows stay in the hot tables before the maintenance job archives them
+    HISTORY_HOT_DAYS = 30
+    AUDIT_HOT_DAYS = 90
+    # Days before history deltas are folded into monthly checkpoints; below HISTORY_HOT_DAYS so
+    # compaction sees rows before the archive job moves them out of the hot table
+    HISTORY_COMPACT_DAYS = 14
+    # Seconds between background cache warm-ups (see prewarm); under half the snapshot's max_age,
+    # so a snapshot in use is always rebuilt by one of the two runs before it expires
+    PREWARM_INTERVAL = 25
+    # Columns the Armory editor writes back
+    EDITABLE_COLUMNS = ["name", "brand", "model_no", "household", "bin_location", "is_stationary", "capabilities", "safety_rating"]
+
     def __init__(self):
+        self._versions = dict.fromkeys(self.CACHED_TABLES, 0)
+        self._versions_lock = threading.Lock()
+        self._session_cache = {} # token -> (expires monotonic, user dict)
+        self._session_lock = threading.Lock()
+
         token = None
         try:
             token = st.secrets.get("MOTHERDUCK_TOKEN")
@@ -52,108 +171,416 @@ class DataManager:
             st.error(f"❌ DB Connection Failed: {e}")
             st.stop()
 
-        self.con.execute("CREATE DATABASE IF NOT EXISTS hintze_inventory")
-        self.con.execute("USE hintze_inventory")
+        use_db = None
+        if self.con_str.startswith('md:'):
+            # MotherDuck-only DDL; a local file is already its own database
+            self.con.execute("CREATE DATABASE IF NOT EXISTS hintze_inventory")
+            self.con.execute("USE hintze_inventory")
+            use_db = lambda cur: cur.execute("USE hintze_inventory") # Cursors start on the default database
         self._init_schema()
 
+        # self.con is the root connection (schema setup only). Queries run on pooled
+        # cursors so concurrent sessions don't share one connection.
+        try:
+            pool_size = int(st.secrets.get("DB_POOL_SIZE", 4))
+        except (FileNotFoundError, TypeError, ValueError):
+            pool_size = 4
+        self._pool = CursorPool(self.con, size=pool_size, setup=use_db)
+        self.audit = AuditBuffer(self.cursor) # Write-behind audit_logs
+
+        # Discord alerts go out on a background thread, never on the user's click
+        try:
+            webhook_url = st.secrets.get("DISCORD_WEBHOOK")
+        except FileNotFoundError:
+            webhook_url = None
+        self.alerts = AlertDispatcher(webhook_url) if webhook_url else None
+
+        # Cold tier for old history and audit rows (a local path or any URL DuckDB can write, e.g. s3://).
+        # Archiving deletes from the primary, so with MotherDuck it needs a location that outlives this
+        # host; unset, nothing is archived. A local database file can keep its archive next to it.
+        try:
+            self.archive_dir = st.secrets.get("ARCHIVE_DIR")
+        except FileNotFoundError:
+            self.archive_dir = None
+        if not self.archive_dir:
+            self.archive_dir = None if token else "archive"
+
+        # One shared, read-only copy of the tools table for every session (replaces a per-caller cache_data copy)
+        self.tools_snapshot = TableSnapshot("SELECT * FROM tools", max_age=60, derived={"display": add_display_columns})
+        self.search_index = ToolSearchIndex() # Rebuilt from tools_snapshot whenever it is replaced
+        self.scheduler = None # Started by start_maintenance() (once per process, from app.get_db)
+
+        # Optional local mirror for reads (MotherDuck only; writes still go to the primary pool)
+        self.replica = None
+        try:
+            use_replica = token and st.secrets.get("READ_REPLICA")
+            replica_path = st.secrets.get("REPLICA_PATH", "inventory.db")
+        except FileNotFoundError:
+            use_replica = False
+        if use_replica:
+            self.replica = ReadReplica(replica_path, indexes=INDEXES)
+            self._replica_pool = CursorPool(self.replica.con, size=pool_size)
+
     def _init_schema(self):
         # (Schema definitions same as before...)
-        self.con.execute("CREATE TABLE IF NOT EXISTS tools (id VARCHAR PRIMARY KEY, name VARCHAR, brand VARCHAR, model_no VARCHAR, power_source VARCHAR, owner VARCHAR, household VARCHAR, bin_location VARCHAR, is_stationary BOOLEAN, status VARCHAR, borrower VARCHAR, return_date TIMESTAMP, capabilities VARCHAR, safety_rating VARCHAR)")
+        self.con.execute("CREATE TABLE IF NOT EXISTS tools (id VARCHAR PRIMARY KEY, name VARCHAR, brand VARCHAR, model_no VARCHAR, power_source VARCHAR, owner VARCHAR, household VARCHAR, bin_location VARCHAR, is_stationary BOOLEAN, status VARCHAR, borrower VARCHAR, return_date TIMESTAMP, capabilities VARCHAR, safety_rating VARCHAR, updated_at TIMESTAMP)")
+        # Change-sequence column for replica sync (older tables and admin uploads lack it)
+        self.con.execute("ALTER TABLE tools ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+        self.con.execute("UPDATE tools SET updated_at = current_timestamp WHERE updated_at IS NULL")
         self.con.execute("CREATE TABLE IF NOT EXISTS family (name VARCHAR, role VARCHAR, household VARCHAR, email VARCHAR PRIMARY KEY)")
-        self.con.execute("CREATE TABLE IF NOT EXISTS tool_history (history_id VARCHAR, tool_id VARCHAR, changed_by VARCHAR, change_date TIMESTAMP, previous_state JSON)")
+        self.con.execute(f"CREATE TABLE IF NOT EXISTS tool_history (history_id VARCHAR, tool_id VARCHAR, changed_by VARCHAR, change_date TIMESTAMP, previous_state JSON, kind VARCHAR, changes {CHANGE_TYPE})")
+        # Typed deltas (see core/history.py); older rows keep their full previous_state
+        self.con.execute("ALTER TABLE tool_history ADD COLUMN IF NOT EXISTS kind VARCHAR")
+        self.con.execute(f"ALTER TABLE tool_history ADD COLUMN IF NOT EXISTS changes {CHANGE_TYPE}")
         self.con.execute("CREATE TABLE IF NOT EXISTS sessions (token VARCHAR PRIMARY KEY, email VARCHAR, created_at TIMESTAMP, expires_at TIMESTAMP)")
         self.con.execute("CREATE TABLE IF NOT EXISTS audit_logs (log_id VARCHAR PRIMARY KEY, timestamp TIMESTAMP, event_type VARCHAR, user_email VARCHAR, details VARCHAR)")
+        self.missing_indexes = ensure_indexes(self.con)
+
+    # --- Connection Pool ---
+    def cursor(self):
+        """Leases a pooled cursor on the primary database (re-entrant within a thread)."""
+        return self._pool.lease()
+
+    def pool_stats(self):
+        stats = {"primary": self._pool.stats()}
+        if self.replica is not None: stats["replica"] = self._replica_pool.stats()
+        return stats
 
     # --- Read Methods (Now using Cache) ---
+    @contextmanager
+    def _reader(self):
+        """Cursor for cached reads: the local replica when it's enabled and has data, else MotherDuck."""
+        if self.replica is not None:
+            versions = tuple(self._versions[t] for t in ("tools", "family", "history"))
+            with self.cursor() as primary:
+                ready = self.replica.refresh(primary, versions)
+            if ready:
+                with self._replica_pool.lease() as con:
+                    yield con
+                return
+        with self.cursor() as con:
+            yield con
+
     def get_family_members(self):
-        return _fetch_family_members(self.con)
+        return _fetch_family_members(self._reader, self.table_version("family"))
 
     def get_all_tools(self):
-        # New method to replace raw SQL in app.py
-        return _fetch_all_tools(self.con)
+        """The whole registry as a DataFrame sharing the process-wide snapshot's memory (copy-on-write)."""
+        return self.tools_snapshot.frame(self._reader, self.table_version("tools"))
+
+    def get_display_tools(self):
+        """get_all_tools() plus the derived display columns (see add_display_columns), built once per snapshot."""
+        return self.tools_snapshot.frame(self._reader, self.table_version("tools"), derived="display")
+
+    def query_tools(self, filters=None, sort=None, offset=0, limit=50, columns=None):
+        """
+        One page of the registry (display columns included): returns (page DataFrame, total matching rows).
+
+        filters: {column: value, list of values, or None for missing}
+        sort:    a column, or a list of columns / (column, ascending) pairs. Without
+                 one, an 'id' list filter keeps its own order (e.g. search ranking).
+        columns: the columns to return (default: all)
+        Runs over the shared snapshot, so paging costs no database round trip and
+        only the requested rows and columns are materialized for the browser.
+        """
+        df = self.get_display_tools()
+        sort_keys = [sort] if isinstance(sort, str) else list(sort or [])
+        sort_keys = [(k, True) if isinstance(k, str) else tuple(k) for k in sort_keys]
+        unknown = (set(filters or {}) | {col for col, _ in sort_keys} | set(columns or [])) - set(df.columns)
+        if unknown: raise ValueError(f"Unknown tool columns: {', '.join(sorted(unknown))}")
+
+        mask = np.ones(len(df), dtype=bool)
+        for col, value in (filters or {}).items():
+            if value is None:
+                mask &= df[col].isna().to_numpy()
+            elif isinstance(value, (list, tuple, set, pd.Series, np.ndarray)):
+                mask &= df[col].isin(list(value)).to_numpy()
+            else:
+                mask &= df[col].eq(value).to_numpy(dtype=bool, na_value=False)
+        matched = df[mask]
+        ranked = (filters or {}).get('id')
+        if not sort_keys and isinstance(ranked, (list, tuple, pd.Series, np.ndarray)):
+            position = {tid: i for i, tid in reversed(list(enumerate(ranked)))} # First occurrence wins
+            matched = matched.iloc[np.argsort(matched['id'].map(position).to_numpy(), kind="stable")]
+        elif sort_keys:
+            matched = matched.sort_values([c for c, _ in sort_keys], ascending=[a for _, a in sort_keys],
+                                          na_position="last", kind="stable")
+        page = matched.iloc[max(0, int(offset)):max(0, int(offset)) + int(limit)]
+        return (page[list(columns)] if columns else page), len(matched)
+
+    def search_tools(self, query, limit=50):
+        """
+        Tools matching any word of query in name, brand or capabilities, best match first.
+
+        Ranked by BM25 with stemming (see core/search.py) over the shared snapshot;
+        returns the display rows plus a 'score' column.
+        """
+        hits = self.search_index.search(self.get_tools_arrow(), query, limit)
+        return hits.merge(self.get_display_tools(), on='id', how='inner')
+
+    def get_tools_arrow(self):
+        """The same snapshot as a pyarrow Table, for zero-copy queries over it."""
+        return self.tools_snapshot.arrow(self._reader, self.table_version("tools"))
         
     def get_available_tools(self):
         # We can filter the cached "all tools" instead of querying DB again
-        df = _fetch_all_tools(self.con)
+        df = self.get_all_tools()
         return df[df['status'] == 'Available']
     
     def get_borrowed_tools(self):
-        df = _fetch_all_tools(self.con)
+        df = self.get_all_tools()
         return df[df['status'] == 'Borrowed']
         
     def get_my_tools(self, owner_name):
-        return _fetch_my_tools(self.con, owner_name)
+        return _fetch_my_tools(self._reader, owner_name, self.table_version("tools"))
+
+    def get_tool_history(self, tool_id, include_archive=False):
+        archive_dir = self.archive_dir if include_archive else None
+        return _fetch_tool_history(self._reader, tool_id, self.table_version("history"), archive_dir)
+
+    def get_audit_logs(self, days=7, include_archive=False, limit=500):
+        """Most recent audit events from the last `days` days. Not cached: security views want them live."""
+        self.audit.flush() # Include events still waiting in the write-behind buffer
+        with self.cursor() as con:
+            source = with_archive(con, "audit_logs", self.archive_dir if include_archive else None)
+            return con.execute(f"""
+                SELECT timestamp, event_type, user_email, details FROM {source}
+                WHERE timestamp >= current_timestamp - (INTERVAL '1' DAY * ?)
+                ORDER BY timestamp DESC LIMIT ?
+            """, [int(days), int(limit)]).df()
+
+    # --- Point-in-Time Reads ---
+    # Rebuilt in one query from the per-field pre-images in tool_history (see core/history.py).
+    # Loan check-outs and returns are single-statement updates that aren't versioned, so
+    # status/borrower/return_date only reflect edits and retirements, not loans.
+    def get_tools_as_of(self, ts):
+        """The registry as it stood at ts: tools added later are left out, tools deleted since are included (empty before history begins)."""
+        return _fetch_tools_as_of(self._reader, pd.Timestamp(ts).to_pydatetime(),
+                                  self.table_version("tools"), self.table_version("history"), self.archive_dir)
+
+    def get_tool_as_of(self, tool_id, ts):
+        """One tool's row at ts as a dict, or None if there is no recorded state of it then (not added yet, deleted, or before history begins)."""
+        with self._reader() as con:
+            source = with_archive(con, "tool_history", self.archive_dir)
+            points = "SELECT $1::VARCHAR AS tool_id, $2::TIMESTAMP AS ts"
+            row = con.execute(f"SELECT * FROM ({state_sql(points, source=source, tool_id='$1::VARCHAR')})",
+                              [tool_id, pd.Timestamp(ts).to_pydatetime()]).fetchone()
+        if row is None or not row[2]: return None
+        return {"id": tool_id, **dict(zip(TRACKED_COLUMNS, row[3:]))}
 
-    def get_tool_history(self, tool_id):
-        return _fetch_tool_history(self.con, tool_id)
+    # --- Cache Invalidation (Per-Table Generation Counters) ---
+    def table_version(self, table):
+        return self._versions[table]
+
+    def invalidate(self, *tables):
+        """Bumps the generation counter of each table so cached reads of it miss."""
+        with self._versions_lock:
+            for table in tables:
+                self._versions[table] += 1
+        if "family" in tables:
+            # Cached sessions carry name/role/household from family
+            with self._session_lock:
+                self._session_cache.clear()
 
-    # --- Write Methods (Clear Cache on Update) ---
     def clear_cache(self):
-        """Forces a reload of data."""
-        st.cache_data.clear()
-
-    def _archive_tool(self, tool_id, user_name):
-        current = self.con.execute("SELECT * FROM tools WHERE id = ?", [tool_id]).df()
-        if not current.empty:
-            record = current.iloc[0].to_dict()
-            def default(o):
-                if isinstance(o, (datetime.date, datetime.datetime)): return o.isoformat()
-            json_state = json.dumps(record, default=default)
-            hist_id = str(uuid.uuid4())
-            self.con.execute("INSERT INTO tool_history VALUES (?, ?, ?, current_timestamp, ?)", [hist_id, tool_id, user_name, json_state])
+        """Forces a reload of all DB-backed data. Cached AI responses are left alone."""
+        self.invalidate(*self.CACHED_TABLES)
+
+    # --- Write Methods (Invalidate Touched Tables on Update) ---
+    # Every write to tools stamps updated_at so the read replica can sync incrementally.
+    def add_tool(self, tool, user_name=None):
+        """Inserts a new tool from a dict of column values and returns its ID."""
+        new_id = f"TOOL_{uuid.uuid4().hex[:6].upper()}"
+        with self.cursor() as con:
+            con.execute("""
+                INSERT INTO tool_history (history_id, tool_id, changed_by, change_date, kind)
+                VALUES (uuid()::VARCHAR, ?, ?, current_timestamp, 'create')
+            """, [new_id, user_name or tool.get('owner')])
+            con.execute("""
+                INSERT INTO tools (id, name, brand, model_no, power_source, owner, household, bin_location,
+                                   is_stationary, status, borrower, return_date, capabilities, safety_rating, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'Available', NULL, NULL, ?, ?, current_timestamp)
+            """, [new_id, tool.get('name'), tool.get('brand'), tool.get('model_no'), tool.get('power_source'),
+                  tool.get('owner'), tool.get('household'), tool.get('bin_location'), tool.get('is_stationary'),
+                  tool.get('capabilities'), tool.get('safety_rating')])
+        self.invalidate("tools", "history")
+        return new_id
+
+    @contextmanager
+    def _tracked(self, tool_ids, user_name):
+        """
+        Records one history delta per listed tool changed inside the block.
+
+        Pre-images are pulled before the block runs and diffed against the rows
+        afterwards, so only the fields that actually changed are stored. The read,
+        the block's writes and the delta insert share one transaction, so a
+        concurrent edit can't slip in between the pre-image and the update.
+        """
+        with self.cursor() as con:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                before = fetch_arrow(con.execute("SELECT * FROM tools WHERE id IN (SELECT unnest(?))", [list(tool_ids)]))
+                con.register("_before", before)
+                try:
+                    yield con
+                    con.execute(DELTA_INSERT, [user_name])
+                finally:
+                    con.unregister("_before")
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    def _archive_tools(self, tool_ids, user_name, kind='checkpoint'):
+        # Full-row snapshot built by DuckDB (to_json of the row); one INSERT ... SELECT per batch
+        with self.cursor() as con:
+            con.execute("""
+                INSERT INTO tool_history (history_id, tool_id, changed_by, change_date, previous_state, kind)
+                SELECT uuid()::VARCHAR, t.id, ?, current_timestamp, to_json(t), ?
+                FROM tools t WHERE t.id IN (SELECT unnest(?))
+            """, [user_name, kind, list(tool_ids)])
 
     def update_tool_location(self, tool_id, new_bin, new_household, user_name):
-        self._archive_tool(tool_id, user_name)
-        self.con.execute("UPDATE tools SET bin_location = ?, household = ? WHERE id = ?", [new_bin, new_household, tool_id])
-        self.clear_cache() # <--- Clear cache so UI updates
+        with self._tracked([tool_id], user_name) as con:
+            con.execute("UPDATE tools SET bin_location = ?, household = ?, updated_at = current_timestamp WHERE id = ?", [new_bin, new_household, tool_id])
+        self.invalidate("tools", "history") # <--- Evict cached reads so UI updates
 
     def retire_tool(self, tool_id, reason, user_name):
-        self._archive_tool(tool_id, user_name)
-        self.con.execute("UPDATE tools SET status = 'Retired', bin_location = ? WHERE id = ?", [f"Retired: {reason}", tool_id])
-        self.clear_cache()
+        with self._tracked([tool_id], user_name) as con:
+            con.execute("UPDATE tools SET status = 'Retired', bin_location = ?, updated_at = current_timestamp WHERE id = ?", [f"Retired: {reason}", tool_id])
+        self.invalidate("tools", "history")
 
     def delete_tool(self, tool_id, user_name):
-        self._archive_tool(tool_id, user_name)
-        self.con.execute("DELETE FROM tools WHERE id = ?", [tool_id])
-        self.log_event("ADMIN_DELETE", user_name, f"Permanently deleted tool {tool_id}")
-        self.clear_cache()
-
-    def batch_update_tools(self, df, user_name):
-        for index, row in df.iterrows():
-            self._archive_tool(row['id'], user_name)
-            self.con.execute("""
-                UPDATE tools 
-                SET name=?, brand=?, model_no=?, household=?, bin_location=?, is_stationary=?, capabilities=?, safety_rating=?
-                WHERE id=?
-            """, [row['name'], row['brand'], row['model_no'], row['household'], row['bin_location'], row['is_stationary'], row['capabilities'], row['safety_rating'], row['id']])
-        self.clear_cache()
+        self.delete_tools([tool_id], user_name)
 
-    def purge_old_history(self, days=30):
-        # Ensure days is an integer to prevent injection if passed loosely, though parameterization helps too
-        if not isinstance(days, int):
+    def delete_tools(self, tool_ids, user_name):
+        ids = [str(tid) for tid in tool_ids]
+        if not ids: return
+        with self.cursor() as con:
+            # Snapshot, delete and audit rows commit together (the audit rows skip the write-behind buffer for that)
+            con.execute("BEGIN TRANSACTION")
             try:
-                days = int(days)
-            except ValueError:
-                return 0
-        
-        # DuckDB interval parameterization can be tricky, so we'll use a safe integer bind for the days value if possible, 
-        # or construct the interval string safely since we strictly validated 'days' as int above.
-        # However, a cleaner way in standard SQL is often: current_timestamp - (INTERVAL '1' DAY * ?)
-        
-        # Optimized: Single Atomic Query using RETURNING
+                self._archive_tools(ids, user_name, kind='delete')
+                con.execute("DELETE FROM tools WHERE id IN (SELECT unnest(?))", [ids])
+                con.execute("""
+                    INSERT INTO audit_logs
+                    SELECT uuid()::VARCHAR, current_timestamp, 'ADMIN_DELETE', ?, 'Permanently deleted tool ' || id
+                    FROM (SELECT unnest(?) AS id)
+                """, [user_name, ids])
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        retriever.remove(ids)
+        self.invalidate("tools", "history")
+
+    def changed_rows(self, edited_df, original_df):
+        """Returns the rows of edited_df whose editable columns differ from original_df."""
+        cols = self.EDITABLE_COLUMNS
+        edited = edited_df.set_index('id')[cols]
+        original = original_df.drop_duplicates('id').set_index('id')[cols].reindex(edited.index)
+        differs = (edited != original) & ~(edited.isna() & original.isna())
+        return edited[differs.any(axis=1)].reset_index()
+
+    def batch_update_tools(self, df, user_name, original_df=None):
+        # Only rows that were actually edited are archived and written back
+        if original_df is None: original_df = self.get_all_tools()
+        changed = self.changed_rows(df, original_df)
+        if changed.empty: return 0
+
+        ids = [str(tid) for tid in changed['id']]
+        set_clause = ", ".join(f"{col} = e.{col}" for col in self.EDITABLE_COLUMNS)
+        with self.cursor() as con:
+            con.register("edited_tools", changed)
+            try:
+                with self._tracked(ids, user_name): # One transaction: pre-images, update and deltas
+                    con.execute(f"UPDATE tools SET {set_clause}, updated_at = current_timestamp FROM edited_tools e WHERE tools.id = e.id")
+            finally:
+                con.unregister("edited_tools")
+        self.invalidate("tools", "history")
+        return len(ids)
+
+    def purge_old_history(self, days=30):
+        """Moves history older than `days` to the Parquet archive (nothing is lost). Returns the number of rows moved."""
+        # Ensure days is an integer to prevent injection if passed loosely
         try:
-             # DuckDB supports RETURNING or we can just rely on rowcount if available, 
-             # but fetching returned IDs is a surefire way to get the count.
-             deleted_ids = self.con.execute(
-                 "DELETE FROM tool_history WHERE change_date < current_timestamp - (INTERVAL '1' DAY * ?) RETURNING history_id", 
-                 [days]
-             ).fetchall()
-             count = len(deleted_ids)
-        except Exception as e:
-             # Fallback if RETURNING not supported in older DuckDB versions (though 1.1+ should have it)
-             count = self.con.execute("DELETE FROM tool_history WHERE change_date < current_timestamp - (INTERVAL '1' DAY * ?)", [days]).rowcount
-        
-        return count
+            days = int(days)
+        except (TypeError, ValueError):
+            return 0
+        moved = self.archive_old_rows("tool_history", days)
+        self.invalidate("history")
+        return moved
+
+    def archive_old_rows(self, table, days):
+        """
+        Moves rows of a tiered table older than `days` into date-partitioned, ZSTD Parquet.
+
+        COPY and DELETE run in one transaction and share its current_timestamp,
+        so exactly the rows written out are removed from the hot table.
+        Returns the number of rows moved (0, with a warning, if no ARCHIVE_DIR is configured).
+        """
+        if not self.archive_dir:
+            logger.warning("Not archiving %s: set ARCHIVE_DIR to a durable location (e.g. s3://...) to enable the cold tier", table)
+            return 0
+        ts_col = TIERED_TABLES[table][0]
+        path = f"{self.archive_dir}/{table}"
+        if "://" not in path: os.makedirs(path, exist_ok=True)
+        old = f"{ts_col} < current_timestamp - (INTERVAL '1' DAY * {int(days)})"
+        with self.cursor() as con:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                moved = con.execute(f"""
+                    COPY (SELECT *, year({ts_col}) AS year, month({ts_col}) AS month FROM {table} WHERE {old})
+                    TO '{path.replace("'", "''")}' (FORMAT parquet, COMPRESSION zstd, PARTITION_BY (year, month), APPEND)
+                """).fetchone()[0]
+                if moved: con.execute(f"DELETE FROM {table} WHERE {old}")
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        return moved
+
+    def compact_history(self, older_than_days=None):
+        """
+        Folds deltas older than `older_than_days` (default HISTORY_COMPACT_DAYS) into one full
+        checkpoint per tool per month. Returns the number of deltas folded.
+
+        A checkpoint holds the state just before the month's first change, so
+        every state from before the month and after it can still be rebuilt;
+        only the steps within the month are lost. Months with a single delta
+        are left alone (a checkpoint would be bigger than the delta).
+        """
+        if older_than_days is None: older_than_days = self.HISTORY_COMPACT_DAYS
+        old = f"change_date < current_timestamp - (INTERVAL '1' DAY * {int(older_than_days)})"
+        months = f"""
+            SELECT tool_id, date_trunc('month', change_date) AS month, min(change_date) AS ts,
+                   string_agg(DISTINCT changed_by, ', ') AS changed_by,
+                   list_distinct(flatten(list(list_transform(changes, c -> c.field)))) AS fields
+            FROM tool_history
+            WHERE kind = 'delta' AND {old}
+            GROUP BY ALL HAVING count(*) > 1
+        """
+        with self.cursor() as con:
+            # Both statements see the same current_timestamp (transaction start), so the same months
+            con.execute("BEGIN TRANSACTION")
+            try:
+                con.execute(f"""
+                    INSERT INTO tool_history (history_id, tool_id, changed_by, change_date, previous_state, kind)
+                    SELECT uuid()::VARCHAR, s.tool_id, m.changed_by, s.ts, {checkpoint_json('s', 'm.fields')}, 'checkpoint'
+                    FROM ({state_sql(f"SELECT tool_id, ts FROM ({months})", inclusive=True)}) s
+                    JOIN ({months}) m ON m.tool_id = s.tool_id AND m.ts = s.ts
+                """)
+                folded = con.execute(f"""
+                    DELETE FROM tool_history h USING ({months}) m
+                    WHERE h.kind = 'delta' AND h.{old} AND h.tool_id = m.tool_id AND date_trunc('month', h.change_date) = m.month
+                    RETURNING h.history_id
+                """).fetchall()
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        self.invalidate("history")
+        return len(folded)
 
     # --- Ghost Tolls Management ---
     def get_ghost_tools(self):
@@ -165,60 +592,152 @@ class DataManager:
         return ghosts
 
     def batch_reassign_tools(self, tool_ids, new_owner, new_household):
-        for tid in tool_ids:
-            self._archive_tool(tid, f"System Reassign to {new_owner}")
-            self.con.execute("UPDATE tools SET owner = ?, household = ? WHERE id = ?", [new_owner, new_household, tid])
-        self.clear_cache()
+        ids = [str(tid) for tid in tool_ids]
+        if not ids: return
+        with self._tracked(ids, f"System Reassign to {new_owner}") as con:
+            con.execute("UPDATE tools SET owner = ?, household = ?, updated_at = current_timestamp WHERE id IN (SELECT unnest(?))", [new_owner, new_household, ids])
+        self.invalidate("tools", "history")
 
     # --- Security Logging ---
     def log_event(self, event_type, email, details):
-        log_id = str(uuid.uuid4())
-        self.con.execute("INSERT INTO audit_logs VALUES (?, current_timestamp, ?, ?, ?)", [log_id, event_type, email, details])
+        # Buffered; written in batches by self.audit (call self.audit.flush() to force)
+        self.audit.add(event_type, email, details)
         if event_type in ["FAILED_LOGIN", "ADMIN_UPDATE"] or "RETIRE" in details:
             self._send_discord_alert(event_type, email, details)
 
     def _send_discord_alert(self, event_type, email, details):
-        webhook_url = st.secrets.get("DISCORD_WEBHOOK")
-        if not webhook_url: return
-        data = {"content": f"🚨 **{event_type}**", "embeds": [{"description": f"**User:** {email}\n**Details:** {details}"}]}
-        try: requests.post(webhook_url, json=data)
-        except: pass 
+        if self.alerts: self.alerts.submit(event_type, email, details)
 
     # --- Standard Methods ---
     def borrow_tool(self, tool_id, user, days):
-        # Parameterized query to prevent SQLi
-        self.con.execute("UPDATE tools SET status='Borrowed', borrower=?, return_date=current_date + (INTERVAL '1' DAY * ?) WHERE id=?", [user, days, tool_id])
-        self.clear_cache() # Update UI immediately
+        return self.borrow_tools([tool_id], user, days)[tool_id]
     
     def return_tool(self, tool_id):
-        self.con.execute("UPDATE tools SET status='Available', borrower=NULL, return_date=NULL WHERE id=?", [tool_id])
-        self.clear_cache()
+        return self.return_tools([tool_id])[tool_id]
 
     def extend_loan(self, tool_id, extra_days):
-        self.con.execute("UPDATE tools SET return_date = return_date + (INTERVAL '1' DAY * ?) WHERE id=?", [extra_days, tool_id])
-        self.clear_cache()
+        return self.extend_loans([tool_id], extra_days)[tool_id]
+
+    # --- Bulk Loan Transitions ---
+    # Each batch is a single set-based UPDATE (one round trip, one implicit transaction).
+    # They return {tool_id: True/False} so callers can report which tools actually changed.
+    def _bulk_transition(self, sql, params, tool_ids):
+        ids = [str(tid) for tid in dict.fromkeys(tool_ids)]
+        if not ids: return {}
+        with self.cursor() as con:
+            changed = {row[0] for row in con.execute(sql, params + [ids]).fetchall()}
+        if changed: self.invalidate("tools") # Update UI immediately
+        return {tid: tid in changed for tid in ids}
+
+    def borrow_tools(self, tool_ids, user, days):
+        # Parameterized query to prevent SQLi
+        return self._bulk_transition("""
+            UPDATE tools SET status='Borrowed', borrower=?, return_date=current_date + (INTERVAL '1' DAY * ?), updated_at=current_timestamp
+            WHERE id IN (SELECT unnest(?)) AND status = 'Available'
+            RETURNING id
+        """, [user, days], tool_ids)
+
+    def return_tools(self, tool_ids):
+        return self._bulk_transition("""
+            UPDATE tools SET status='Available', borrower=NULL, return_date=NULL, updated_at=current_timestamp
+            WHERE id IN (SELECT unnest(?)) AND status = 'Borrowed'
+            RETURNING id
+        """, [], tool_ids)
+
+    def extend_loans(self, tool_ids, extra_days):
+        return self._bulk_transition("""
+            UPDATE tools SET return_date = return_date + (INTERVAL '1' DAY * ?), updated_at = current_timestamp
+            WHERE id IN (SELECT unnest(?)) AND return_date IS NOT NULL
+            RETURNING id
+        """, [extra_days], tool_ids)
 
     def get_user_by_email(self, email):
-        result = self.con.execute("SELECT name, role, household FROM family WHERE email = ?", [email]).fetchone()
+        with self.cursor() as con:
+            result = con.execute("SELECT name, role, household FROM family WHERE email = ?", [email]).fetchone()
         if result: return {"name": result[0], "role": result[1], "household": result[2]}
         return None
 
     # --- Session Security ---
     def create_session(self, email):
         token = secrets.token_urlsafe(32)
-        self.con.execute("INSERT INTO sessions VALUES (?, ?, current_timestamp, current_timestamp + INTERVAL '7 days')", [token, email])
+        with self.cursor() as con:
+            con.execute("INSERT INTO sessions VALUES (?, ?, current_timestamp, current_timestamp + INTERVAL '7 days')", [token, email])
+        self.invalidate("sessions")
         return token
 
     def get_user_from_session(self, token):
-        result = self.con.execute("SELECT email FROM sessions WHERE token = ? AND expires_at > current_timestamp", [token]).fetchone()
-        if result: return self.get_user_by_email(result[0])
-        return None
+        # Most reruns are answered from the in-process cache with no DB query
+        now = time.monotonic()
+        with self._session_lock:
+            hit = self._session_cache.get(token)
+        if hit and hit[0] > now: return dict(hit[1])
+
+        # Single round trip: session and family row together
+        with self.cursor() as con:
+            result = con.execute("""
+                SELECT f.name, f.role, f.household, date_diff('second', current_timestamp::TIMESTAMP, s.expires_at)
+                FROM sessions s JOIN family f ON f.email = s.email
+                WHERE s.token = ? AND s.expires_at > current_timestamp
+            """, [token]).fetchone()
+        if not result:
+            with self._session_lock:
+                self._session_cache.pop(token, None)
+            return None
+
+        user = {"name": result[0], "role": result[1], "household": result[2]}
+        expires = now + min(self.SESSION_CACHE_TTL, result[3]) # Never outlive the session itself
+        with self._session_lock:
+            if len(self._session_cache) >= self.SESSION_CACHE_MAX:
+                self._session_cache = {t: e for t, e in self._session_cache.items() if e[0] > now}
+            self._session_cache[token] = (expires, user)
+        return dict(user)
 
     def revoke_session(self, token):
-        self.con.execute("DELETE FROM sessions WHERE token = ?", [token])
+        with self._session_lock:
+            self._session_cache.pop(token, None)
+        with self.cursor() as con:
+            con.execute("DELETE FROM sessions WHERE token = ?", [token])
+        self.invalidate("sessions")
     
     def clean_old_sessions(self):
-        self.con.execute("DELETE FROM sessions WHERE expires_at < current_timestamp")
+        with self.cursor() as con:
+            con.execute("DELETE FROM sessions WHERE expires_at < current_timestamp")
+        now = time.monotonic()
+        with self._session_lock:
+            self._session_cache = {t: e for t, e in self._session_cache.items() if e[0] > now}
+        self.invalidate("sessions")
+
+    # --- Background Maintenance ---
+    def start_maintenance(self):
+        """Starts the maintenance thread: session cleanup, cold-tier archiving and cache warm-up."""
+        if self.scheduler is None:
+            self.scheduler = MaintenanceScheduler()
+            # Every worker has its own snapshot and caches, so each one warms itself
+            self.scheduler.add("prewarm_cache", self.prewarm, self.PREWARM_INTERVAL, delay=0, local=True)
+            self.scheduler.add("clean_old_sessions", self.clean_old_sessions, 3600, delay=60)
+            if self.archive_dir: # Archiving deletes from the primary: only with somewhere durable to put the rows
+                self.scheduler.add("archive_cold_rows", self.archive_cold_rows, 24 * 3600, delay=300)
+            else:
+                self.scheduler.add("compact_history", self.compact_history, 24 * 3600, delay=300)
+            self.scheduler.start()
+        return self.scheduler
+
+    def maintenance_stats(self):
+        return self.scheduler.stats() if self.scheduler is not None else {}
+
+    def prewarm(self):
+        """Loads the reads every page makes, so the next visitor finds them cached."""
+        # Rebuilt ahead of expiry once it is older than one interval, and only if something read it since the last build
+        snapshot = self.tools_snapshot
+        fresh = snapshot.refresh(self._reader, self.table_version("tools"), margin=snapshot.max_age - self.PREWARM_INTERVAL)
+        if fresh is not None: retriever.sync(fresh, complete=True) # AI shortlists from this build then skip the sync
+        self.search_index.prepare() # Downloads the fts extension here rather than on someone's search
+        self.get_family_members()
+
+    def archive_cold_rows(self):
+        self.compact_history() # First: it only reads the hot table
+        self.purge_old_history(self.HISTORY_HOT_DAYS)
+        self.archive_old_rows("audit_logs", self.AUDIT_HOT_DAYS)
 
     def seed_data(self, tools_list, family_list):
         pass
\ No newline at end of file
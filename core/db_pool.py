@@ -0,0 +1,75 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# db_pool.py
+# Bounded pool of DuckDB cursors. Each cursor is its own connection to the same
+# database instance, so concurrent Streamlit sessions don't serialize on (or
+# interleave statements over) one shared connection.
+
+
+class CursorPool:
+    def __init__(self, con, size=4, setup=None, timeout=30):
+        self._con = con
+        self._setup = setup            # Called on each new cursor (e.g. "USE hintze_inventory")
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue() # LIFO keeps the warmest cursors busy
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"leases": 0, "waited": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0, "cursors": 0}
+
+    def _new_cursor(self):
+        cur = self._con.cursor()
+        if self._setup: self._setup(cur)
+        with self._stats_lock:
+            self._stats["cursors"] += 1
+        return cur
+
+    def _record_wait(self, wait_ms):
+        with self._stats_lock:
+            self._stats["leases"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            if wait_ms >= 1: self._stats["waited"] += 1
+
+    @contextmanager
+    def lease(self):
+        """
+        Yields a cursor for the current thread.
+
+        Re-entrant: nested leases on the same thread get the same cursor, so a
+        method can open a transaction and call helpers that join it.
+        """
+        held = getattr(self._local, "cursor", None)
+        if held is not None:
+            yield held
+            return
+
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No DuckDB cursor free after {self.timeout}s (pool size {self.size})")
+        self._record_wait((time.perf_counter() - start) * 1000)
+        try:
+            try:
+                cur = self._idle.get_nowait()
+            except queue.Empty:
+                cur = self._new_cursor()
+            self._local.cursor = cur
+            try:
+                yield cur
+            finally:
+                self._local.cursor = None
+                self._idle.put(cur)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Lease counts and wait times (ms) for monitoring pool pressure."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["size"] = self.size
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / stats["leases"] if stats["leases"] else 0.0
+        return stats
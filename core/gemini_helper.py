@@ -1,8 +1,19 @@
 import google.genai as genai
 from google.genai import types
+import httpx
 import streamlit as st
+import pandas as pd
+import difflib
 import json
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError: # Outside a Streamlit runtime worker threads need no script context
+    add_script_run_ctx = get_script_run_ctx = None
 
 # Import Centralized Prompts
 from .prompts import (
@@ -18,6 +29,10 @@ from .prompts import (
     prompt_borrowing_request,
     prompt_return_request
 )
+from .ai_cache import ResponseStore
+from .prompt_budget import DEFAULT_BUDGET, decode_ids, encode_tools, usage
+from .prompt_context import cached as _cached, fingerprint as _fingerprint
+from .retrieval import shortlist
 
 
 # Feature Configuration
@@ -25,25 +40,113 @@ from .prompts import (
 DEFAULT_MODEL = "gemini-2.0-flash" 
 CHEAPEST_MODEL = "gemini-2.0-flash-lite"
 
-def get_client():
-    """Initializes and returns the Google Gen AI Client using Service Account API Key."""
+DEFAULT_TIMEOUT = 30 # Seconds per Gemini request (AI_TIMEOUT_SECONDS secret)
+HEALTH_TTL = 60      # Seconds a health check result is reused
+
+# One client per process: its HTTP connection pool (and TLS sessions) is reused
+# by every session thread instead of being set up again for each call.
+_client = None
+_client_lock = threading.Lock()
+_health = None # (checked monotonic, result dict)
+
+def _new_client():
+    """Initializes the Google Gen AI Client using Service Account API Key."""
     try:
         api_key = st.secrets.get("VERTEX_API_KEY")
         
         if not api_key:
             st.error("⚠️ Server Error: VERTEX_API_KEY not found in secrets.")
             return None
+        timeout = float(st.secrets.get("AI_TIMEOUT_SECONDS", DEFAULT_TIMEOUT))
             
         # Initialize Client for Vertex AI with API Key
-        client = genai.Client(
+        return genai.Client(
             vertexai=True,
-            api_key=api_key
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                timeout=int(timeout * 1000), # Milliseconds
+                client_args={"limits": httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=300)},
+            ),
         )
-        return client
     except Exception as e:
         st.error(f"Config Error: {e}")
         return None
 
+def get_client():
+    """The shared Gen AI client, created on first use. None (after showing why) if it can't be configured."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _new_client() # Not configured stays None, so fixing the secret needs no restart
+        return _client
+
+def set_client(client):
+    """Replaces the shared client (e.g. with a fake in tests); None makes the next call build a new one."""
+    global _client, _health
+    with _client_lock:
+        _client, _health = client, None
+
+def client_health(force=False):
+    """Whether Gemini answers: {'ok', 'latency_ms', 'error'}, re-checked at most every HEALTH_TTL seconds."""
+    global _health
+    if _health and not force and time.monotonic() - _health[0] < HEALTH_TTL: return _health[1]
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        if client is None: raise RuntimeError("Gemini client is not configured")
+        client.models.get(model=DEFAULT_MODEL) # Metadata only, no tokens
+        result = {"ok": True, "latency_ms": (time.perf_counter() - start) * 1000, "error": None}
+    except Exception as e:
+        result = {"ok": False, "latency_ms": (time.perf_counter() - start) * 1000, "error": str(e)}
+    _health = (time.monotonic(), result)
+    return result
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_response_store():
+    """The process-wide persistent AI response store (path from the AI_CACHE_PATH secret)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                path = st.secrets.get("AI_CACHE_PATH", "ai_cache.db")
+            except FileNotFoundError:
+                path = "ai_cache.db"
+            _store = ResponseStore(path)
+        return _store
+
+def context_budget():
+    """Token budget for the inventory part of each prompt (AI_CONTEXT_TOKENS secret)."""
+    try:
+        return int(st.secrets.get("AI_CONTEXT_TOKENS", DEFAULT_BUDGET))
+    except (FileNotFoundError, TypeError, ValueError):
+        return DEFAULT_BUDGET
+
+def generate_text(prompt, model_name=DEFAULT_MODEL, label=None, context=(), validate=None):
+    """
+    Gemini's answer to prompt, from the response store when it has one. Raises on API errors.
+
+    Only answers `validate(text)` accepts (all, if not given) are stored or served from the store.
+    """
+    store = get_response_store()
+    text = store.get(prompt, model_name)
+    if text is not None and (validate is None or validate(text)):
+        usage.record(label, prompt, context, from_store=True)
+        return text
+
+    client = get_client()
+    if not client: return None # Config error already shown
+    response = client.models.generate_content(
+        model=model_name,
+        contents=prompt
+    )
+    text = response.text
+    meta = getattr(response, "usage_metadata", None)
+    usage.record(label, prompt, context, api_tokens=getattr(meta, "prompt_token_count", None))
+    if validate is None or validate(text): store.put(prompt, model_name, text) # A malformed answer is asked again next time
+    return text
+
 def handle_ai_error(e):
     err_str = str(e)
     if "429" in err_str or "Quota exceeded" in err_str:
@@ -52,109 +155,130 @@ def handle_ai_error(e):
     st.error(f"⚠️ AI Error: {err_str}")
     return None
 
-def run_genai_query(prompt, model_name=DEFAULT_MODEL, expected_json=False):
-    """Refactored helper to handle client init and generation."""
-    client = get_client()
-    if not client: return None # Config error already shown
+def _parse_json(text):
+    """The JSON object in a model answer (code fences stripped), or None if it doesn't parse."""
+    clean = (text or "").replace("```json", "").replace("```", "").strip()
+    # Try to catch simple formatting issues
+    if "{" not in clean: return None
+    try:
+        return json.loads(clean)
+    except ValueError:
+        return None
 
+def run_genai_query(prompt, model_name=DEFAULT_MODEL, expected_json=False, label=None, context=()):
+    """Refactored helper to handle client init and generation. `label` and `context` (Encoded tables) go to the usage log."""
     try:
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
-        
-        text = response.text
+        validate = (lambda answer: _parse_json(answer) is not None) if expected_json else None
+        text = generate_text(prompt, model_name, label, context, validate=validate)
+        if text is None: return None
         if expected_json:
-            clean = text.replace("```json", "").replace("```", "").strip()
-            # Try to catch simple formatting issues
-            if "{" in clean:
-                try:
-                    return json.loads(clean)
-                except:
-                    pass # Fallthrough if json load fails directly
-            return {} 
+            parsed = _parse_json(text)
+            return {} if parsed is None else parsed
             
         return text
     except Exception as e:
         return handle_ai_error(e)
 
+# --- Cache Keys ---
+# The cached helpers below are keyed on the normalized query, a fingerprint of just
+# the rows and columns that go into the prompt, and the user scope. The DataFrames
+# themselves are passed as '_'-prefixed (unhashed) arguments, so Streamlit never
+# hashes a whole table, and an edit to a tool the prompt doesn't show (or to a
+# column it doesn't use) leaves cached answers valid.
+#
+# Inside, the rows go into the prompt as compact tables with short tool aliases
+# (see core/prompt_budget.py); ids in the answer are mapped back before returning.
+
+def _normalize(text):
+    """A user query with surrounding and repeated whitespace removed (case is kept: names matter to the prompts)."""
+    return " ".join(str(text or "").split())
+
+def _columns(fields, group_by=None):
+    return [col for _, col in fields] + ([group_by[1]] if group_by else [])
+
+def _context(query, df, columns):
+    """
+    The shortlisted rows and columns a prompt is built from, and their fingerprint.
+
+    Rows from a tools snapshot (see core/snapshot.py) are kept per query, snapshot
+    build and set of tool ids, so asking again skips the shortlist and the hashing.
+    """
+    def build():
+        ctx = shortlist(query, df).reindex(columns=columns)
+        return ctx, _fingerprint(ctx, columns)
+    token = df.attrs.get("snapshot")
+    if token is None: return build()
+    ctx, fingerprint = _cached(("context", query, token, _fingerprint(df, ['id']), tuple(columns)), build)
+    return ctx.copy(deep=False), fingerprint
+
+# Fields each prompt shows per tool, as (label, column), plus an optional column written once per group
+HOUSE = ("House", "household")
+ADVICE_FIELDS = (("Name", "name"), ("Brand", "brand"), ("Model", "model_no"), ("Fixed", "is_stationary"), ("Safety", "safety_rating"), ("Caps", "capabilities"))
+FILTER_FIELDS = (("ID", "id"), ("Name", "name"), ("Brand", "brand"), ("Cap", "capabilities"))
+MOVER_FIELDS = (("ID", "id"), ("Name", "name"), ("Brand", "brand"))
+DUPLICATE_FIELDS = (("Name", "name"), ("Brand", "brand"), ("Model", "model_no"), ("Owner", "owner"))
+LENDING_FIELDS = (("ID", "id"), ("Name", "name"), ("Brand", "brand"))
+DELETION_FIELDS = (("ID", "id"), ("Name", "name"), ("Owner", "owner"), ("Status", "status"))
+LOAN_FIELDS = (("ID", "id"), ("Name", "name"), ("Due", "return_date"))
+ASSET_FIELDS = (("ID", "id"), ("Name", "name"), ("With", "borrower"), ("Due", "return_date"))
+RECS_FIELDS = (("ID", "id"), ("Name", "name"), ("Brand", "brand"), ("Location", "location"), ("Status", "state"), ("Fixed", "is_stationary"))
+RECS_COLUMNS = ['id', 'name', 'brand', 'owner', 'household', 'bin_location', 'status', 'borrower', 'is_stationary']
+
 # 1. Project Tool Manager
-@st.cache_data(ttl=3600, show_spinner=False)
 def get_ai_advice(user_query, available_tools_df):
-    client = get_client()
-    if not client: return "⚠️ Configuration Missing"
-    
-    tool_context = ""
-    for index, row in available_tools_df.iterrows():
-        details = f"{row.get('brand', '')} {row.get('model_no', '')}".strip()
-        stat_note = "[STATIONARY]" if row.get('is_stationary') else ""
-        tool_context += f"- {row['name']} [{details}] {stat_note} (Safety: {row['safety_rating']}, Caps: {row['capabilities']})\n"
+    query = _normalize(user_query)
+    ctx, fingerprint = _context(query, available_tools_df, _columns(ADVICE_FIELDS))
+    return _get_ai_advice(query, fingerprint, ctx)
 
-    prompt = prompt_project_advice(tool_context, user_query)
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _get_ai_advice(user_query, fingerprint, _tools_df):
+    tools = encode_tools(_tools_df, ADVICE_FIELDS, context_budget(), key=fingerprint)
+    prompt = prompt_project_advice(tools.text, user_query)
     
     try:
-        response = client.models.generate_content(
-            model=DEFAULT_MODEL,
-            contents=prompt
-        )
-        return response.text
+        text = generate_text(prompt, DEFAULT_MODEL, "advice", [tools])
+        return text if text is not None else "⚠️ Configuration Missing"
     except Exception as e:
         if "429" in str(e): return "🚦 System busy (Rate Limit). Please wait 30s."
         return f"⚠️ Error: {str(e)}"
 
 # 2. SMART PARSER
-@st.cache_data(ttl=3600, show_spinner=False)
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
 def ai_parse_tool(raw_text):
     prompt = prompt_tool_parser(raw_text)
-    return run_genai_query(prompt, expected_json=True)
+    return run_genai_query(prompt, expected_json=True, label="tool_parser")
 
 # 3. PROJECT PLANNER
-@st.cache_data(ttl=3600, show_spinner=False)
 def get_smart_recommendations(user_query, available_tools_df, user_household, user_name):
-    my_tools = []
-    others_tools = []
-    
-    for index, row in available_tools_df.iterrows():
-        status = f"with {row.get('borrower')}" if row.get('status') == 'Borrowed' else "available"
-        
-        def safe_get(key):
-            val = row.get(key)
-            if hasattr(val, 'item'): return val.item()
-            return val
-
-        # Calculate Ownership Explicitly
-        raw_owner = safe_get('owner')
-        raw_house = safe_get('household')
-        owner_val = str(raw_owner or "").strip().lower()
-        house_val = str(raw_house or "").strip().lower()
-        curr_user_val = str(user_name or "").strip().lower()
-        curr_house_val = str(user_household or "").strip().lower()
-        
-        is_mine = False
-        if curr_user_val and owner_val == curr_user_val:
-            is_mine = True
-        elif curr_house_val and house_val == curr_house_val:
-            is_mine = True
-
-        item = {
-            "id": safe_get('id'), 
-            "name": safe_get('name'), 
-            "brand": safe_get('brand'),
-            "location": f"{raw_house} - {safe_get('bin_location')}",
-            "status": status, 
-            "is_stationary": safe_get('is_stationary')
-        }
-        
-        if is_mine:
-            my_tools.append(item)
-        else:
-            item["owner_house"] = raw_house # Needed for borrow info
-            others_tools.append(item)
+    query = _normalize(user_query)
+    # Only the tools closest to the project go into the prompt
+    ctx, fingerprint = _context(query, available_tools_df, RECS_COLUMNS)
+    return _get_smart_recommendations(query, fingerprint, user_household, user_name, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _get_smart_recommendations(user_query, fingerprint, user_household, user_name, _tools_df):
+    df = _tools_df
+    # Calculate Ownership Explicitly
+    owner_val = df['owner'].fillna("").astype(str).str.strip().str.lower()
+    house_val = df['household'].fillna("").astype(str).str.strip().str.lower()
+    curr_user_val = str(user_name or "").strip().lower()
+    curr_house_val = str(user_household or "").strip().lower()
+    is_mine = (owner_val.eq(curr_user_val) & bool(curr_user_val)) | (house_val.eq(curr_house_val) & bool(curr_house_val))
+
+    df = df.assign(
+        state=("with " + df['borrower'].astype(str)).where(df['status'].eq('Borrowed'), "available"),
+        location=df['household'].astype(str) + " - " + df['bin_location'].astype(str),
+    )
+    budget = context_budget() // 2
+    mine = encode_tools(df[is_mine], RECS_FIELDS, budget, alias_prefix="M")
+    # Other households are grouped by house, which the borrow list needs
+    others = encode_tools(df[~is_mine].assign(location=df['bin_location']), RECS_FIELDS, budget, group_by=HOUSE,
+                          alias_prefix="B")
     
-    prompt = prompt_smart_recs(user_query, user_name, user_household, my_tools, others_tools)
+    prompt = prompt_smart_recs(user_query, user_name, user_household, mine.text, others.text)
     
     # Custom logic here as in original: catch structure
-    res = run_genai_query(prompt, expected_json=False) # Get text first
+    res = run_genai_query(prompt, expected_json=False, label="smart_recs", context=[mine, others]) # Get text first
     if not res: return None
     if isinstance(res, dict): return res # Should not happen if False above
     
@@ -162,94 +286,176 @@ def get_smart_recommendations(user_query, available_tools_df, user_household, us
         start = res.find('{')
         end = res.rfind('}') + 1
         if start != -1 and end != -1:
-            return json.loads(res[start:end])
+            recs = json.loads(res[start:end])
         else:
             clean = res.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean)
+            recs = json.loads(clean)
     except:
         return None
+    for item in recs.get("borrow_list", []) if isinstance(recs, dict) else []:
+        if isinstance(item, dict) and "tool_id" in item:
+            item["tool_id"] = decode_ids(item["tool_id"], others.aliases | mine.aliases)
+    return recs
 
 # 4. INVENTORY FILTER
-@st.cache_data(ttl=3600, show_spinner=False)
 def ai_filter_inventory(user_query, inventory_df):
-    context = ""
-    for index, row in inventory_df.iterrows():
-        context += f"ID: {row['id']} | Name: {row['name']} | Brand: {row['brand']} | Cap: {row['capabilities']}\n"
-    
-    prompt = prompt_inventory_filter(user_query, context)
-    res = run_genai_query(prompt, model_name=CHEAPEST_MODEL, expected_json=True)
+    query = _normalize(user_query)
+    ctx, fingerprint = _context(query, inventory_df, _columns(FILTER_FIELDS))
+    return _ai_filter_inventory(query, fingerprint, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _ai_filter_inventory(user_query, fingerprint, _inventory_df):
+    tools = encode_tools(_inventory_df, FILTER_FIELDS, context_budget(), key=fingerprint)
+    prompt = prompt_inventory_filter(user_query, tools.text)
+    res = run_genai_query(prompt, model_name=CHEAPEST_MODEL, expected_json=True, label="inventory_filter", context=[tools])
     if res and isinstance(res, dict):
-        return res.get("match_ids", [])
+        return decode_ids(res.get("match_ids", []), tools.aliases)
     return []
 
 # 5. SMART MOVER
-@st.cache_data(ttl=3600, show_spinner=False)
 def parse_location_update(user_query, user_tools_df):
-    tool_list_str = ""
-    for index, row in user_tools_df.iterrows():
-        tool_list_str += f"- ID: {row['id']} | Name: {row['name']} | Brand: {row['brand']}\n"
-        
-    prompt = prompt_location_update(user_query, tool_list_str)
-    return run_genai_query(prompt, expected_json=True)
+    query = _normalize(user_query)
+    ctx, fingerprint = _context(query, user_tools_df, _columns(MOVER_FIELDS))
+    return _parse_location_update(query, fingerprint, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _parse_location_update(user_query, fingerprint, _user_tools_df):
+    tools = encode_tools(_user_tools_df, MOVER_FIELDS, context_budget(), key=fingerprint)
+    prompt = prompt_location_update(user_query, tools.text)
+    res = run_genai_query(prompt, expected_json=True, label="location_update", context=[tools])
+    for update in res.get("updates", []) if isinstance(res, dict) else []:
+        if isinstance(update, dict) and "tool_id" in update:
+            update["tool_id"] = decode_ids(update["tool_id"], tools.aliases)
+    return res
 
 # 6. DUPLICATE CHECKER
-@st.cache_data(ttl=3600, show_spinner=False)
 def check_duplicate_tool(new_tool_data, inventory_df):
-    existing_list = []
-    for index, row in inventory_df.iterrows():
-        existing_list.append(f"Name: {row['name']} | Brand: {row['brand']} | Model: {row['model_no']} | Owner: {row['owner']}")
-    
-    new_str = f"{new_tool_data.get('name')} {new_tool_data.get('brand')} {new_tool_data.get('model_no')}"
-    
-    prompt = prompt_duplicate_check(new_str, existing_list)
-    return run_genai_query(prompt, expected_json=True)
+    new_str = " ".join(str(new_tool_data.get(k)) for k in ('name', 'brand', 'model_no') if new_tool_data.get(k))
+    ctx, fingerprint = _context(new_str, inventory_df, _columns(DUPLICATE_FIELDS))
+    return _check_duplicate_tool(new_str, fingerprint, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _check_duplicate_tool(new_str, fingerprint, _inventory_df):
+    existing = encode_tools(_inventory_df, DUPLICATE_FIELDS, context_budget(), key=fingerprint)
+    prompt = prompt_duplicate_check(new_str, existing.text)
+    return run_genai_query(prompt, expected_json=True, label="duplicate_check", context=[existing])
 
 # 7. LENDING ASSISTANT
-@st.cache_data(ttl=3600, show_spinner=False)
 def parse_lending_request(user_query, my_tools_df, family_list):
-    tools_ctx = ""
-    for idx, row in my_tools_df.iterrows():
-        tools_ctx += f"ID: {row['id']} | Name: {row['name']} | Brand: {row['brand']} | House: {row.get('household', 'Unknown')}\n"
-    
-    family_names = [f['name'] for f in family_list]
-    
-    prompt = prompt_lending_request(user_query, tools_ctx, family_names)
-    return run_genai_query(prompt, expected_json=True)
+    family_names = tuple(f['name'] for f in family_list)
+    fingerprint = _fingerprint(my_tools_df, _columns(LENDING_FIELDS, HOUSE))
+    return _parse_lending_request(_normalize(user_query), fingerprint, family_names, my_tools_df)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _parse_lending_request(user_query, fingerprint, family_names, _my_tools_df):
+    tools = encode_tools(_my_tools_df, LENDING_FIELDS, context_budget(), group_by=HOUSE, key=fingerprint)
+    prompt = prompt_lending_request(user_query, tools.text, list(family_names))
+    return _decode_candidates(run_genai_query(prompt, expected_json=True, label="lending", context=[tools]), tools.aliases)
+
+def _decode_candidates(res, aliases):
+    for cand in res.get("candidates", []) if isinstance(res, dict) else []:
+        if isinstance(cand, dict) and "id" in cand:
+            cand["id"] = decode_ids(cand["id"], aliases)
+    return res
 
 # 8. INCINERATOR AID
-@st.cache_data(ttl=3600, show_spinner=False)
 def ai_find_tools_for_deletion(user_query, tools_df):
-    tools_ctx = ""
-    for idx, row in tools_df.iterrows():
-        tools_ctx += f"ID: {row['id']} | Name: {row['name']} | Owner: {row['owner']} | House: {row['household']} | Status: {row['status']}\n"
-    
-    prompt = prompt_deletion_helper(user_query, tools_ctx)
-    res = run_genai_query(prompt, expected_json=True)
+    query = _normalize(user_query)
+    ctx, fingerprint = _context(query, tools_df, _columns(DELETION_FIELDS, HOUSE))
+    return _ai_find_tools_for_deletion(query, fingerprint, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _ai_find_tools_for_deletion(user_query, fingerprint, _tools_df):
+    tools = encode_tools(_tools_df, DELETION_FIELDS, context_budget(), group_by=HOUSE, key=fingerprint)
+    prompt = prompt_deletion_helper(user_query, tools.text)
+    res = run_genai_query(prompt, expected_json=True, label="deletion", context=[tools])
     if res and isinstance(res, dict):
-        return res.get("delete_ids", [])
+        return decode_ids(res.get("delete_ids", []), tools.aliases)
     return []
 
 # 8. BORROWING ASSISTANT
-@st.cache_data(ttl=3600, show_spinner=False)
 def parse_borrowing_request(user_query, available_pool_df):
-    tools_ctx = ""
-    for idx, row in available_pool_df.iterrows():
-        tools_ctx += f"ID: {row['id']} | Name: {row['name']} | Brand: {row['brand']} | House: {row['household']}\n"
-    
-    prompt = prompt_borrowing_request(user_query, tools_ctx)
-    return run_genai_query(prompt, expected_json=True)
+    query = _normalize(user_query)
+    ctx, fingerprint = _context(query, available_pool_df, _columns(LENDING_FIELDS, HOUSE))
+    return _parse_borrowing_request(query, fingerprint, ctx)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _parse_borrowing_request(user_query, fingerprint, _available_pool_df):
+    tools = encode_tools(_available_pool_df, LENDING_FIELDS, context_budget(), group_by=HOUSE, key=fingerprint)
+    prompt = prompt_borrowing_request(user_query, tools.text)
+    return _decode_candidates(run_genai_query(prompt, expected_json=True, label="borrowing", context=[tools]), tools.aliases)
 
 # 9. RETURN ASSISTANT
-@st.cache_data(ttl=3600, show_spinner=False)
 def parse_return_request(user_query, my_loans_df, my_assets_df):
-    loans_ctx = ""
-    for idx, row in my_loans_df.iterrows():
-        loans_ctx += f"ID: {row['id']} | Name: {row['name']} | Due: {row['return_date']}\n"
-        
-    assets_ctx = ""
-    for idx, row in my_assets_df.iterrows():
-        assets_ctx += f"ID: {row['id']} | Name: {row['name']} | With: {row['borrower']} | Due: {row['return_date']}\n"
-    
-    prompt = prompt_return_request(user_query, loans_ctx, assets_ctx)
-    return run_genai_query(prompt, expected_json=True)
+    fingerprint = (_fingerprint(my_loans_df, _columns(LOAN_FIELDS)), _fingerprint(my_assets_df, _columns(ASSET_FIELDS)))
+    return _parse_return_request(_normalize(user_query), fingerprint, my_loans_df, my_assets_df)
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _parse_return_request(user_query, fingerprint, _my_loans_df, _my_assets_df):
+    budget = context_budget() // 2
+    loans = encode_tools(_my_loans_df, LOAN_FIELDS, budget, alias_prefix="L", key=fingerprint[0])
+    assets = encode_tools(_my_assets_df, ASSET_FIELDS, budget, alias_prefix="A", key=fingerprint[1])
+    prompt = prompt_return_request(user_query, loans.text, assets.text)
+    res = run_genai_query(prompt, expected_json=True, label="return", context=[loans, assets])
+    if isinstance(res, dict) and "tool_ids" in res:
+        res["tool_ids"] = decode_ids(res["tool_ids"], loans.aliases | assets.aliases)
+    return res
+
+# 10. ADD-TOOL PIPELINE
+DUPLICATE_CUTOFF = 0.5 # Local similarity that ranks a tool ahead of the retrieval shortlist
+DUPLICATE_CANDIDATES = 10 # Tools the model duplicate check is shown
+
+def _plain(text):
+    """Lowercase words with punctuation dropped ('WD-1450.' -> 'wd1450'), for matching names and model numbers."""
+    return [w for w in (re.sub(r"[\W_]+", "", word) for word in str(text or "").lower().split()) if w]
+
+def likely_duplicates(text, tools_df, k=DUPLICATE_CANDIDATES, cutoff=DUPLICATE_CUTOFF):
+    """
+    Local fuzzy pre-check: the rows of tools_df that look like the tool described by text, best first.
+
+    Retrieval narrows to a few candidates, then difflib compares 'name brand model'
+    against the text; a model number appearing in the text counts as a match.
+    Punctuation is ignored on both sides.
+    """
+    if tools_df.empty or not _plain(text): return tools_df.iloc[:0]
+    cands = shortlist(text, tools_df, k=25)
+    words = _plain(text)
+    query = " ".join(words)
+    labels = (cands['name'].fillna("").astype(str) + " " + cands['brand'].fillna("").astype(str) + " "
+              + cands['model_no'].fillna("").astype(str)).map(lambda label: " ".join(_plain(label)))
+    models = cands['model_no'].map(lambda model: "".join(_plain(model)))
+    scores = [max(difflib.SequenceMatcher(None, query, label).ratio(), 1.0 if model and model in words else 0.0)
+              for label, model in zip(labels, models)]
+    cands = cands.assign(_score=scores)
+    return cands[cands['_score'] >= cutoff].sort_values('_score', ascending=False, kind="stable").head(k).drop(columns='_score')
+
+def analyze_new_tool(raw_text, house_tools, on_progress=None):
+    """
+    Parses raw_text with the model and checks house_tools for duplicates, overlapped: returns (ai_data, dup).
+
+    The duplicate check runs on the raw description in parallel with the parse. It is
+    shown the tools the local pre-check finds similar first, then the closest ones by
+    retrieval, so a description the pre-check can't match is still checked.
+    on_progress(fraction, text) is called from the calling thread as each step finishes.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    def attach():
+        if ctx is not None: add_script_run_ctx(threading.current_thread(), ctx) # Lets workers use st.* and the caches
+
+    report = on_progress or (lambda fraction, text: None)
+    report(0.1, "Looking for similar tools...")
+    likely = likely_duplicates(raw_text, house_tools)
+    nearest = shortlist(raw_text, house_tools, k=DUPLICATE_CANDIDATES)
+    candidates = pd.concat([likely, nearest[~nearest['id'].isin(likely['id'])]]).head(DUPLICATE_CANDIDATES)
+    results = {"dup": {"is_duplicate": False}}
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="add-tool", initializer=attach) as pool:
+        steps = {pool.submit(ai_parse_tool, raw_text): ("ai_data", "Parsed details")}
+        if not candidates.empty:
+            steps[pool.submit(check_duplicate_tool, {'name': raw_text}, candidates)] = ("dup", "Checked for duplicates")
+        report(0.2, f"🤖 AI is analyzing your tool ({len(steps)} request{'s' if len(steps) > 1 else ''} in flight)...")
+        for done, future in enumerate(as_completed(steps), 1):
+            name, text = steps[future]
+            results[name] = future.result()
+            report(0.2 + 0.8 * done / len(steps), text)
+    return results.get("ai_data"), results["dup"]
 
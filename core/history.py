@@ -0,0 +1,111 @@
+# history.py
+# Record kinds of tool_history and the SQL that writes and replays them.
+#
+# Every row is a pre-image: what the tool looked like just before change_date.
+#   create     - the tool was added (there is no earlier state)
+#   delta      - `changes` lists only the fields that changed, old and new value as text
+#   checkpoint - `previous_state` holds the whole row as JSON (rows written before
+#                deltas existed have kind NULL and are read as checkpoints)
+#   delete     - a checkpoint written just before the tool was deleted
+
+# Columns of tools recorded in history, with the type to cast text values back to
+TRACKED_COLUMNS = {
+    "name": "VARCHAR", "brand": "VARCHAR", "model_no": "VARCHAR", "power_source": "VARCHAR",
+    "owner": "VARCHAR", "household": "VARCHAR", "bin_location": "VARCHAR", "is_stationary": "BOOLEAN",
+    "status": "VARCHAR", "borrower": "VARCHAR", "return_date": "TIMESTAMP", "capabilities": "VARCHAR",
+    "safety_rating": "VARCHAR",
+}
+
+# Loans are set-based updates that write no history, so the live value of these says nothing about
+# the past; compaction only checkpoints them when one of the folded deltas recorded a change
+LOAN_COLUMNS = ("status", "borrower", "return_date")
+
+CHANGE_TYPE = "STRUCT(field VARCHAR, old_value VARCHAR, new_value VARCHAR)[]"
+
+# Appends a delta for every tool in the registered `_before` pre-images whose row now differs
+_changes = ", ".join(
+    f"{{'field': '{col}', 'old_value': b.{col}::VARCHAR, 'new_value': t.{col}::VARCHAR}}" for col in TRACKED_COLUMNS
+)
+DELTA_INSERT = f"""
+    INSERT INTO tool_history (history_id, tool_id, changed_by, change_date, kind, changes)
+    SELECT uuid()::VARCHAR, id, ?, current_timestamp, 'delta', changes FROM (
+        SELECT t.id, list_filter([{_changes}], c -> c.old_value IS DISTINCT FROM c.new_value) AS changes
+        FROM _before b JOIN tools t ON t.id = b.id
+    ) WHERE len(changes) > 0
+"""
+
+_field_list = ", ".join(f"'{col}'" for col in TRACKED_COLUMNS)
+
+
+def field_events(source="tool_history", tool_id=None):
+    """
+    One row per recorded field value: (tool_id, change_date, kind, field, old_value).
+
+    Deltas contribute the fields they list, checkpoints every field they hold,
+    creates a row with no field. `source` may be a subquery (e.g. hot + archived rows).
+    `tool_id`, an SQL expression such as a parameter, limits the rows to one tool
+    where they are read, so the tool_id index serves the lookup.
+    """
+    where = f"WHERE tool_id = {tool_id}" if tool_id else ""
+    return f"""
+        WITH h AS (SELECT * FROM {source} {where})
+        SELECT tool_id, change_date, kind, c.field, c.old_value
+        FROM (SELECT tool_id, change_date, kind, unnest(changes) AS c FROM h WHERE kind = 'delta')
+        UNION ALL
+        SELECT h.tool_id, h.change_date, coalesce(h.kind, 'checkpoint'), f.field, json_extract_string(h.previous_state, '$.' || f.field)
+        FROM h, (SELECT unnest([{_field_list}]) AS field) f
+        WHERE (h.kind IS NULL OR h.kind IN ('checkpoint', 'delete')) AND json_exists(h.previous_state, '$.' || f.field)
+        UNION ALL
+        SELECT tool_id, change_date, kind, NULL, NULL FROM h WHERE kind = 'create'
+    """
+
+
+def state_sql(points, inclusive=False, source="tool_history", tool_id=None):
+    """
+    SQL for the state of each tool in `points` (a query yielding tool_id, ts) at time ts.
+
+    Each field takes the pre-image of the earliest record after ts that mentions
+    it, else the live value in tools. `inclusive` also counts records at exactly
+    ts, i.e. the state just before them. `tool_id` is passed to field_events when
+    every point is the same tool. Output columns: tool_id, ts, exists_at
+    (False if the tool was created later or deleted earlier, or if ts is before the
+    first record in history: tools older than the tracking have no 'create' record,
+    so nothing is known about them before it), then TRACKED_COLUMNS.
+    """
+    op = ">=" if inclusive else ">"
+    picks = ",\n".join(
+        f"arg_min({{'v': e.old_value}}, e.change_date) FILTER (WHERE e.field = '{col}') AS {col}" for col in TRACKED_COLUMNS
+    )
+    values = ",\n".join(
+        f"CASE WHEN s.{col} IS NULL THEN t.{col} ELSE TRY_CAST(s.{col}.v AS {typ}) END AS {col}"
+        for col, typ in TRACKED_COLUMNS.items()
+    )
+    return f"""
+        WITH points AS ({points}),
+        tracked AS (SELECT min(change_date) AS since FROM {source}),
+        seen AS (
+            SELECT p.tool_id, p.ts, arg_min(e.kind, e.change_date) AS next_kind, {picks}
+            FROM points p JOIN ({field_events(source, tool_id)}) e ON e.tool_id = p.tool_id AND e.change_date {op} p.ts
+            GROUP BY p.tool_id, p.ts
+        )
+        SELECT p.tool_id, p.ts,
+               coalesce(p.ts >= tr.since AND s.next_kind IS DISTINCT FROM 'create' AND (t.id IS NOT NULL OR s.tool_id IS NOT NULL), false) AS exists_at,
+               {values}
+        FROM points p CROSS JOIN tracked tr
+        LEFT JOIN seen s ON s.tool_id = p.tool_id AND s.ts = p.ts
+        LEFT JOIN tools t ON t.id = p.tool_id
+    """
+
+
+def checkpoint_json(alias="s", fields=None):
+    """
+    to_json() of a checkpoint built from a state_sql() row.
+
+    LOAN_COLUMNS are only written if named in `fields`, an SQL list of field
+    names (e.g. the fields the folded deltas changed); other columns always are.
+    """
+    entries = ", ".join(f"{{'k': '{col}', 'v': to_json({alias}.{col})}}" for col in TRACKED_COLUMNS)
+    loans = ", ".join(f"'{col}'" for col in LOAN_COLUMNS)
+    keep = f"NOT list_contains([{loans}], e.k) OR list_contains({fields or '[]::VARCHAR[]'}, e.k)"
+    return (f"to_json(map_from_entries([{{'k': 'id', 'v': to_json({alias}.tool_id)}}] || "
+            f"list_filter([{entries}], e -> {keep})))")
@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+from .prompt_context import cached, fingerprint
+
+# prompt_budget.py
+# Compact, size-bounded encoding of inventory rows for Gemini prompts.
+#   - rows are a table: the field names once in a header, then 'v1 | v2 | ...'
+#   - tool ids become short aliases (T1, T2, ...) mapped back after the call
+#   - a repeated group column (e.g. the household) is written once above its rows
+#   - rows are added best-first until the token budget is spent
+# Token counts are estimated locally; every call is logged with its estimate
+# (and Gemini's own count when the response has one) for the admin view.
+
+CHARS_PER_TOKEN = 4     # Rough average for English text and short identifiers
+DEFAULT_BUDGET = 3000   # Tokens of inventory context per prompt
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+class Encoded(NamedTuple):
+    text: str
+    aliases: dict   # alias -> real tool id
+    rows: int       # rows included
+    dropped: int    # rows left out to stay within the budget
+    tokens: int     # estimated tokens of text
+
+
+def _values(df, col):
+    if col not in df.columns: return pd.Series("Unknown", index=df.index)
+    values = df[col].astype(str).where(df[col].notna(), "") # Missing values are left blank
+    return values.str.replace("|", "/", regex=False).str.replace("\n", " ", regex=False)
+
+
+def encode_tools(df, fields, budget=DEFAULT_BUDGET, group_by=None, alias_prefix="T", key=None):
+    """
+    df's rows (best first) as a compact table of fields, (label, column) pairs, within `budget` tokens.
+
+    The 'id' column is written as aliases (see decode_ids). `group_by`, a (label, column)
+    pair, writes that column once above the kept rows sharing its value (groups in order
+    of their best row). `key` is the fingerprint of df's prompt columns if the caller
+    already has it.
+    """
+    fields = tuple(fields)
+    columns = [col for _, col in fields] + ([group_by[1]] if group_by else [])
+    cache_key = ("compact", key or fingerprint(df, columns), fields, budget, group_by, alias_prefix)
+
+    def build():
+        if df.empty: return Encoded("", {}, 0, 0, 0)
+        aliases = pd.Series([f"{alias_prefix}{i}" for i in range(1, len(df) + 1)], index=df.index)
+        row = None
+        for _, col in fields:
+            part = aliases if col == "id" else _values(df, col)
+            row = part if row is None else row + " | " + part
+        lines = row + "\n"
+        header = " | ".join(label for label, _ in fields) + "\n"
+        cost = lines.str.len().to_numpy()
+        if group_by:
+            group = _values(df, group_by[1])
+            heads = f"[{group_by[0]}: " + group + "]\n"
+            cost = cost + np.where(group.duplicated().to_numpy(), 0, heads.str.len().to_numpy()) # Paid by each group's best row
+        # Keep the longest best-first prefix that fits
+        keep = int(np.searchsorted(np.cumsum(cost) + len(header), budget * CHARS_PER_TOKEN, side="right"))
+        kept = lines.iloc[:keep]
+        if group_by and keep:
+            codes = pd.Categorical(group.iloc[:keep], categories=group.iloc[:keep].unique()).codes
+            order = np.argsort(codes, kind="stable")
+            kept, kept_group = kept.iloc[order], group.iloc[:keep].iloc[order]
+            starts = kept_group.ne(kept_group.shift()).to_numpy()
+            kept = pd.Series(np.where(starts, heads.loc[kept.index], ""), index=kept.index) + kept
+        text = header + "".join(kept) if keep else ""
+        alias_map = dict(zip(aliases.iloc[:keep], df['id'].iloc[:keep].astype(str))) if 'id' in df.columns else {}
+        return Encoded(text, alias_map, keep, len(df) - keep, estimate_tokens(text))
+    return cached(cache_key, build)
+
+
+def decode_ids(ids, aliases):
+    """Maps aliases in ids (a list, or a single value) back to tool ids; anything else passes through."""
+    if isinstance(ids, list): return [aliases.get(str(i), i) for i in ids]
+    return aliases.get(str(ids), ids) if ids is not None else ids
+
+
+class UsageLog:
+    """Recent AI calls with their prompt size, for spotting growth in latency and cost."""
+
+    def __init__(self, maxlen=500):
+        self.calls = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, label, prompt, context=(), from_store=False, api_tokens=None):
+        entry = {
+            "time": time.time(), "label": label or "other", "est_tokens": estimate_tokens(prompt),
+            "api_tokens": api_tokens, "cached": from_store,
+            "rows": sum(c.rows for c in context), "dropped": sum(c.dropped for c in context),
+        }
+        with self._lock:
+            self.calls.append(entry)
+        return entry
+
+    def summary(self):
+        """Per label: calls, mean and max estimated prompt tokens, share served from cache, rows dropped."""
+        with self._lock:
+            df = pd.DataFrame(list(self.calls))
+        if df.empty: return df
+        return df.groupby("label").agg(
+            calls=("est_tokens", "size"), mean_tokens=("est_tokens", "mean"), max_tokens=("est_tokens", "max"),
+            api_tokens=("api_tokens", "mean"), cached=("cached", "mean"), rows=("rows", "mean"), dropped=("dropped", "sum"),
+        )
+
+
+usage = UsageLog()
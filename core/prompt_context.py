@@ -0,0 +1,45 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# prompt_context.py
+# Cache for the inventory context the Gemini prompts embed (rendered with
+# vectorized string ops in core/prompt_budget.py), keyed by a fingerprint of
+# the rows and columns it was built from. A helper asking for the same tools
+# and fields again (another query, another session) gets the cached render.
+
+MAX_CACHED = 256
+
+_cache = OrderedDict() # key -> render, least recently used first
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def fingerprint(df, columns):
+    """Cheap content hash of df[columns] (row order included); missing columns count as empty."""
+    subset = df.reindex(columns=columns)
+    rows = pd.util.hash_pandas_object(subset, index=False).to_numpy()
+    return hashlib.blake2b(rows.tobytes() + "|".join(columns).encode(), digest_size=16).hexdigest()
+
+
+def cached(key, build):
+    """build()'s result, rendered once per key (kind, fingerprint, options...) and kept while recently used."""
+    with _lock:
+        text = _cache.get(key)
+        if text is not None:
+            _cache.move_to_end(key)
+            stats["hits"] += 1
+            return text
+        stats["misses"] += 1
+    text = build()
+    with _lock:
+        _cache[key] = text
+        while len(_cache) > MAX_CACHED: _cache.popitem(last=False)
+    return text
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+        stats.update(hits=0, misses=0)
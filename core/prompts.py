@@ -21,7 +21,7 @@ def prompt_smart_recs(user_query, user_name, user_household, my_tools, others_to
     {
         "locate_list": [{"tool_name": "Name", "location": "Location"}],
         "track_down_list": [{"tool_name": "Name", "held_by": "Borrower Name"}],
-        "borrow_list": [{"name": "Tool Name", "household": "Owner House", "tool_id": "ID", "reason": "Reason"}],
+        "borrow_list": [{"name": "Tool Name", "household": "Owner House", "tool_id": "ID from LIST 2", "reason": "Reason"}],
         "missing_list": [{"tool_name": "Tool Name", "importance": "High/Med/Low", "advice": "Buy/Rent", "reason": "Explanation"}]
     }
     """
@@ -32,10 +32,10 @@ def prompt_smart_recs(user_query, user_name, user_household, my_tools, others_to
     USER CONTEXT: Name: "{user_name}", Household: "{user_household}"
     
     LIST 1: TOOLS I PHYSICALLY OWN (My Toolbox):
-    {json.dumps(my_tools)}
+    {my_tools}
     
-    LIST 2: OTHER FAMILY MEMBERS' TOOLS (Need to borrow):
-    {json.dumps(others_tools)}
+    LIST 2: OTHER FAMILY MEMBERS' TOOLS (Need to borrow, grouped by owner house):
+    {others_tools}
     
     TASK: Categorize tools into project lists.
     
@@ -69,7 +69,8 @@ def prompt_duplicate_check(new_str, existing_list):
     return f"""
     Check for duplicates.
     NEW: {new_str}
-    EXISTING: {json.dumps(existing_list)}
+    EXISTING:
+    {existing_list}
     OUTPUT JSON: {{ "is_duplicate": true/false, "match_name": "...", "match_owner": "..." }}
     """
 
@@ -0,0 +1,153 @@
+import duckdb
+import threading
+import time
+
+# replica.py
+# Local DuckDB mirror of the read-mostly inventory tables.
+# Reads are served from the local file; writes always go to MotherDuck and
+# the mirror catches up incrementally on the next cache miss.
+
+# How far back to re-read on each sync, so rows committed slightly out of
+# order on the primary are not skipped. Re-copying a row is harmless.
+SYNC_OVERLAP = "INTERVAL '5 seconds'"
+
+
+def fetch_arrow(result):
+    """Materializes a DuckDB result as a pyarrow Table (to_arrow_table on newer DuckDB, fetch_arrow_table before it)."""
+    to_table = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return to_table()
+
+
+class ReadReplica:
+    def __init__(self, path="inventory.db", max_lag=30, indexes=None):
+        self.con = duckdb.connect(path)
+        self.indexes = indexes or {}    # name -> (table, columns), rebuilt after a full copy
+        self.max_lag = max_lag          # Seconds before an idle replica re-checks the primary
+        self.last_sync = None           # time.monotonic() of the last successful sync
+        self.last_error = None
+        self._synced_versions = None    # DataManager table versions seen at the last sync
+        self._lock = threading.Lock()
+        # A file left by a previous run can serve reads before the first sync.
+        # Kept as a flag: self.con is only touched by the syncing thread, readers use cursors.
+        self.has_data = self._columns("tools") is not None
+
+    def _columns(self, table):
+        rows = self.con.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position", [table]
+        ).fetchall()
+        return [r[0] for r in rows] or None
+
+    def _replace(self, table, data):
+        self.con.register("_incoming", data)
+        try:
+            self.con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM _incoming")
+        finally:
+            self.con.unregister("_incoming")
+        for name, (on_table, cols) in self.indexes.items():
+            if on_table == table: self.con.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+
+    def _upsert(self, table, key, data):
+        self.con.register("_incoming", data)
+        try:
+            self.con.execute(f"DELETE FROM {table} WHERE {key} IN (SELECT {key} FROM _incoming)")
+            self.con.execute(f"INSERT INTO {table} SELECT * FROM _incoming")
+        finally:
+            self.con.unregister("_incoming")
+
+    def _needs_full_copy(self, primary, table):
+        # Missing locally, or the primary's schema moved on (e.g. a column was added)
+        local = self._columns(table)
+        if local is None: return True
+        remote = fetch_arrow(primary.execute(f"SELECT * FROM {table} LIMIT 0")).column_names
+        return local != remote
+
+    # --- Sync Steps ---
+    def _sync_tools(self, primary):
+        if self._needs_full_copy(primary, "tools"):
+            self._replace("tools", fetch_arrow(primary.execute("SELECT * FROM tools")))
+            return
+        watermark = self.con.execute("SELECT max(updated_at) FROM tools").fetchone()[0]
+        if watermark is None:
+            changed = fetch_arrow(primary.execute("SELECT * FROM tools"))
+        else:
+            changed = fetch_arrow(primary.execute(
+                f"SELECT * FROM tools WHERE updated_at IS NULL OR updated_at > ?::TIMESTAMP - {SYNC_OVERLAP}", [watermark]
+            ))
+        if changed.num_rows: self._upsert("tools", "id", changed)
+
+        # Deletes leave no row behind, so reconcile IDs only when the counts disagree
+        remote_count = primary.execute("SELECT count(*) FROM tools").fetchone()[0]
+        local_count = self.con.execute("SELECT count(*) FROM tools").fetchone()[0]
+        if remote_count != local_count:
+            ids = fetch_arrow(primary.execute("SELECT id FROM tools"))
+            self.con.register("_remote_ids", ids)
+            try:
+                self.con.execute("DELETE FROM tools WHERE id NOT IN (SELECT id FROM _remote_ids)")
+            finally:
+                self.con.unregister("_remote_ids")
+
+    def _sync_history(self, primary):
+        if self._needs_full_copy(primary, "tool_history"):
+            self._replace("tool_history", fetch_arrow(primary.execute("SELECT * FROM tool_history")))
+            return
+        # History is append-only apart from purges of the oldest rows and compaction
+        oldest = primary.execute("SELECT min(change_date) FROM tool_history").fetchone()[0]
+        if oldest is None:
+            self.con.execute("DELETE FROM tool_history")
+            return
+        self.con.execute("DELETE FROM tool_history WHERE change_date < ?", [oldest])
+        newest = self.con.execute("SELECT max(change_date) FROM tool_history").fetchone()[0]
+        if newest is None:
+            new_rows = fetch_arrow(primary.execute("SELECT * FROM tool_history"))
+        else:
+            new_rows = fetch_arrow(primary.execute(
+                f"SELECT * FROM tool_history WHERE change_date > ?::TIMESTAMP - {SYNC_OVERLAP}", [newest]
+            ))
+        if new_rows.num_rows: self._upsert("tool_history", "history_id", new_rows)
+
+        # Compaction rewrites older months (deltas folded into checkpoints), so recopy when counts disagree
+        remote_count = primary.execute("SELECT count(*) FROM tool_history").fetchone()[0]
+        local_count = self.con.execute("SELECT count(*) FROM tool_history").fetchone()[0]
+        if remote_count != local_count:
+            self._replace("tool_history", fetch_arrow(primary.execute("SELECT * FROM tool_history")))
+
+    def _sync_family(self, primary):
+        # A handful of rows; always copied whole
+        self._replace("family", fetch_arrow(primary.execute("SELECT * FROM family")))
+
+    def sync(self, primary):
+        """Pulls everything that changed on the primary since the last sync."""
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self._sync_tools(primary)
+            self._sync_history(primary)
+            self._sync_family(primary)
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        self.last_sync = time.monotonic()
+
+    def refresh(self, primary, versions):
+        """
+        Syncs if a local write happened since the last sync or the replica is older than max_lag.
+
+        Returns True if the replica can serve reads. A failed sync keeps serving
+        the last good copy, so brief MotherDuck outages don't break page loads.
+        """
+        stale = self.last_sync is None or time.monotonic() - self.last_sync > self.max_lag
+        if versions == self._synced_versions and not stale:
+            return True
+        # Another thread is already syncing: read what's there rather than queueing
+        if not self._lock.acquire(blocking=not self.has_data):
+            return True
+        try:
+            self.sync(primary)
+            self.has_data = True
+            self._synced_versions = versions
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            self._lock.release()
+        return self.has_data
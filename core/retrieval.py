@@ -0,0 +1,130 @@
+import threading
+import zlib
+import numpy as np
+import pandas as pd
+
+# retrieval.py
+# Local, CPU-only retrieval over tool text, used to shortlist the tools an AI
+# prompt needs to see. Each tool is a sparse vector of hashed character
+# trigrams (plus whole words), weighted by TF-IDF and compared by cosine.
+# Vectors are kept per tool id and only recomputed for rows whose text
+# changed, so syncing against a fresh snapshot is cheap; a frame from a
+# snapshot build that was already synced in full is skipped outright.
+
+TEXT_FIELDS = ("name", "brand", "model_no", "capabilities", "owner", "household", "status", "borrower")
+DIMENSIONS = 1 << 18 # Hash buckets; collisions only blur scores slightly
+DEFAULT_K = 60
+
+
+def _features(text):
+    """Hashed trigrams of each space-padded word, plus the words themselves: (bucket indices, counts)."""
+    grams = []
+    for word in text.lower().split():
+        padded = f" {word} "
+        grams.append(word)
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    if not grams: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    buckets = np.fromiter((zlib.crc32(g.encode()) % DIMENSIONS for g in grams), dtype=np.int64, count=len(grams))
+    idx, counts = np.unique(buckets, return_counts=True)
+    return idx, (1 + np.log(counts)).astype(np.float32) # Sublinear tf
+
+
+def _documents(df, fields):
+    cols = [df[f].astype("string").fillna("") for f in fields if f in df.columns]
+    if not cols: return pd.Series("", index=df.index)
+    return cols[0].str.cat(cols[1:], sep=" ")
+
+
+class ToolRetriever:
+    def __init__(self, fields=TEXT_FIELDS):
+        self.fields = fields
+        self.vectorized = 0                 # Rows (re)vectorized so far, for tests and stats
+        self._rows = {}                     # id -> (text hash, bucket indices, tf)
+        self._df = np.zeros(DIMENSIONS, dtype=np.int32) # Document frequency per bucket
+        self._packed = None                 # (ids, row starts, indices, tf), rebuilt lazily after a change
+        self._synced = None                 # Snapshot token (see core/snapshot.py) of the last complete sync
+        self._lock = threading.Lock()
+
+    def sync(self, df, complete=False):
+        """
+        Adds or re-vectorizes the rows of df (needs an 'id' column) whose text changed since the last sync.
+
+        `complete` means df is the whole registry: indexed tools missing from it are dropped.
+        Frames of a snapshot build already synced completely are skipped without reading them.
+        """
+        token = df.attrs.get("snapshot")
+        if token is not None and token == self._synced: return
+        ids = df['id'].astype(str).to_numpy()
+        docs = _documents(df, self.fields)
+        hashes = pd.util.hash_pandas_object(docs, index=False).to_numpy()
+        with self._lock:
+            if complete: self._drop(set(self._rows).difference(ids))
+            rows = self._rows
+            changed = [i for i, (tid, h) in enumerate(zip(ids, hashes)) if (rows.get(tid) or (None,))[0] != h]
+            for i in changed:
+                known = rows.get(ids[i])
+                if known is not None: self._df[known[1]] -= 1
+                idx, tf = _features(docs.iat[i])
+                self._df[idx] += 1
+                rows[ids[i]] = (hashes[i], idx, tf)
+            if changed:
+                self._packed = None
+                self.vectorized += len(changed)
+            if complete: self._synced = token
+
+    def remove(self, ids):
+        with self._lock:
+            self._drop(str(tid) for tid in ids)
+
+    def _drop(self, ids):
+        for tid in ids:
+            known = self._rows.pop(tid, None)
+            if known is not None:
+                self._df[known[1]] -= 1
+                self._packed = None
+
+    def _pack(self):
+        if self._packed is None:
+            ids = np.array(list(self._rows), dtype=object)
+            parts = list(self._rows.values())
+            lengths = np.fromiter((len(p[1]) for p in parts), dtype=np.int64, count=len(parts))
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(parts) else np.empty(0, dtype=np.int64)
+            indices = np.concatenate([p[1] for p in parts]) if parts else np.empty(0, dtype=np.int64)
+            tf = np.concatenate([p[2] for p in parts]) if parts else np.empty(0, dtype=np.float32)
+            self._packed = (ids, starts, lengths, indices, tf)
+        return self._packed
+
+    def scores(self, query):
+        """Cosine similarity of query to every indexed tool: Series indexed by tool id."""
+        with self._lock:
+            ids, starts, lengths, indices, tf = self._pack()
+            if not len(ids): return pd.Series(dtype=np.float32)
+            idf = np.log((1 + len(ids)) / (1 + self._df)).astype(np.float32) + 1
+            q_idx, q_tf = _features(query or "")
+            q = np.zeros(DIMENSIONS, dtype=np.float32)
+            q[q_idx] = q_tf * idf[q_idx]
+            weights = tf * idf[indices]
+            nonempty = lengths > 0
+            dots = np.zeros(len(ids), dtype=np.float32)
+            norms = np.ones(len(ids), dtype=np.float32)
+            if nonempty.any():
+                dots[nonempty] = np.add.reduceat(weights * q[indices], starts[nonempty])
+                norms[nonempty] = np.sqrt(np.add.reduceat(weights * weights, starts[nonempty]))
+            q_norm = np.linalg.norm(q) or 1.0
+            return pd.Series(dots / (norms * q_norm), index=ids)
+
+    def top_k(self, query, df, k=DEFAULT_K):
+        """The k rows of df most similar to query, best first. Small frames are returned whole."""
+        if len(df) <= k: return df
+        self.sync(df)
+        ranked = df['id'].astype(str).map(self.scores(query)).fillna(0).to_numpy()
+        return df.iloc[np.argsort(-ranked, kind="stable")[:k]]
+
+
+# One index per process, shared by every session and AI helper
+retriever = ToolRetriever()
+
+
+def shortlist(query, df, k=DEFAULT_K):
+    """Narrows df to the k tools most relevant to query before it is written into a prompt."""
+    return retriever.top_k(query, df, k)
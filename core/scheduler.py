@@ -0,0 +1,120 @@
+import atexit
+import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows: no flock, so every process considers itself the only one
+    fcntl = None
+
+# scheduler.py
+# In-process maintenance scheduler. One daemon thread runs registered jobs at
+# jittered intervals; a lock file makes sure only one process on the host
+# does the work when several Streamlit workers share the same database.
+# Jobs added with local=True (e.g. warming this process's own caches) run in
+# every process, lock or not.
+
+DEFAULT_LOCK = os.path.join(tempfile.gettempdir(), "hintze_toolshare_maintenance.lock")
+
+
+class MaintenanceScheduler:
+    def __init__(self, jitter=0.1, lock_path=DEFAULT_LOCK, tick=30):
+        self.jitter = jitter          # +/- fraction of each interval, so workers don't fire in lockstep
+        self.lock_path = lock_path    # None disables cross-process locking
+        self.tick = tick              # Longest sleep between checks (also the lock retry period)
+        self.jobs = {}
+        self._lock_file = None
+        self._jobs_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, func, interval, delay=None, local=False):
+        """
+        Registers func to run every `interval` seconds, first after `delay` (default: one jittered interval).
+
+        A `local` job runs in every process, not just the one holding the lock.
+        """
+        first = interval if delay is None else delay
+        with self._jobs_lock:
+            self.jobs[name] = {
+                "func": func, "interval": interval, "local": local, "next_run": time.monotonic() + self._jittered(first),
+                "runs": 0, "failures": 0, "last_run": None, "last_duration_ms": None, "last_error": None,
+            }
+
+    def _jittered(self, seconds):
+        return max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    # --- Single-Instance Lock ---
+    def _holds_lock(self):
+        if self._lock_file is not None or self.lock_path is None or fcntl is None:
+            return True
+        f = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False # Another process is the maintenance worker; retry next tick
+        self._lock_file = f # Held (and the lock kept) for the life of the process
+        return True
+
+    # --- Running ---
+    def run_pending(self, local_only=False):
+        """Runs every job that is due (only the local ones if `local_only`). Returns the names that ran."""
+        now = time.monotonic()
+        with self._jobs_lock:
+            due = [(name, job) for name, job in self.jobs.items() if job["next_run"] <= now and (job["local"] or not local_only)]
+        for name, job in due:
+            start = time.perf_counter()
+            job["last_run"] = datetime.datetime.now()
+            try:
+                job["func"]()
+                job["last_error"] = None
+            except Exception as e:
+                job["failures"] += 1
+                job["last_error"] = str(e)
+            job["runs"] += 1
+            job["last_duration_ms"] = (time.perf_counter() - start) * 1000
+            job["next_run"] = time.monotonic() + self._jittered(job["interval"])
+        return [name for name, _ in due]
+
+    def _sleep_time(self):
+        with self._jobs_lock:
+            next_run = min((job["next_run"] for job in self.jobs.values()), default=None)
+        if next_run is None: return self.tick
+        return min(self.tick, max(0.5, next_run - time.monotonic()))
+
+    def _run(self):
+        while not self._stop.wait(self._sleep_time()):
+            self.run_pending(local_only=not self._holds_lock())
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            self._lock_file.close() # Closing the file releases the flock
+            self._lock_file = None
+
+    @property
+    def is_worker(self):
+        """True if this process runs the jobs (it holds the lock, or locking is off)."""
+        return self._lock_file is not None or self.lock_path is None or fcntl is None
+
+    def stats(self):
+        """Per-job run counts, last run time, duration (ms), last error and seconds until the next run."""
+        now = time.monotonic()
+        with self._jobs_lock:
+            return {
+                name: {k: v for k, v in job.items() if k not in ("func", "next_run")} | {"next_in_s": max(0.0, job["next_run"] - now)}
+                for name, job in self.jobs.items()
+            }
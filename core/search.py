@@ -0,0 +1,96 @@
+import re
+import threading
+import duckdb
+import pandas as pd
+
+# search.py
+# Ranked keyword search over the tool text fields. A private in-memory DuckDB
+# holds the current tools snapshot with a BM25 full-text index (fts extension,
+# Porter stemming), rebuilt whenever the snapshot is replaced, i.e. after
+# every insert or update. A weighted substring score is added to BM25, so
+# partial words ('dew', 'circ') still match as they type; where the extension
+# can't be loaded (offline hosts) that score ranks on its own. The extension is
+# downloaded by prepare() from background maintenance, never on a search.
+
+SEARCH_FIELDS = ("name", "brand", "capabilities")
+FIELD_WEIGHTS = {"name": 3, "brand": 2, "capabilities": 1} # Substring score per matching term
+
+_SUFFIXES = ("ing", "ers", "es", "ed", "er", "s")
+
+
+def _terms(query):
+    """Lower-cased words of query, roughly stemmed so 'saws' and 'sawing' both find 'saw'."""
+    terms = []
+    for word in re.findall(r"[\w-]+", (query or "").lower()):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        if word not in terms: terms.append(word)
+    return terms
+
+
+class ToolSearchIndex:
+    def __init__(self, fields=SEARCH_FIELDS):
+        self.fields = fields
+        self.builds = 0
+        self.fts = None             # None until the first build, then whether BM25 is available
+        self._con = duckdb.connect(":memory:")
+        self._table = None          # The snapshot Arrow table the index was built from
+        self._prepared = False
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Installs the fts extension (a download, tried once per process) and loads it. Returns whether BM25 is available."""
+        if not self._prepared:
+            self._prepared = True
+            try:
+                duckdb.connect(":memory:").execute("INSTALL fts") # Its own connection: searches aren't blocked meanwhile
+            except duckdb.Error:
+                pass
+        with self._lock:
+            if not self.fts and self._load_fts():
+                self.fts = True
+                self._table = None # Rebuilt with the BM25 index on the next search
+        return self.fts
+
+    def _load_fts(self):
+        try:
+            self._con.execute("LOAD fts") # Installed extensions only; never downloads
+        except duckdb.Error:
+            return False
+        return True
+
+    def _build(self, table):
+        if not self.fts: self.fts = self._load_fts()
+        cols = ", ".join(f"coalesce({f}::VARCHAR, '') AS {f}" for f in self.fields)
+        self._con.register("_snapshot", table)
+        try:
+            self._con.execute(f"CREATE OR REPLACE TABLE tools AS SELECT id::VARCHAR AS id, {cols} FROM _snapshot")
+        finally:
+            self._con.unregister("_snapshot")
+        if self.fts:
+            fields = ", ".join(f"'{f}'" for f in self.fields)
+            self._con.execute(f"PRAGMA create_fts_index('tools', 'id', {fields}, stemmer='porter', overwrite=1)")
+        self._table = table
+        self.builds += 1
+
+    def search(self, table, query, limit=50):
+        """Ids in `table` (a tools snapshot) matching any word of query, best first: DataFrame(id, score)."""
+        terms = _terms(query)
+        if not terms: return pd.DataFrame({"id": pd.Series(dtype=str), "score": pd.Series(dtype=float)})
+        with self._lock: # One build per snapshot; the connection is not shared across threads
+            if table is not self._table: self._build(table)
+            score = " + ".join(f"{FIELD_WEIGHTS.get(f, 1)} * contains(lower({f}), t)::INT" for f in self.fields)
+            substring = f"SELECT id, sum({score})::DOUBLE AS score FROM tools, unnest($terms::VARCHAR[]) u(t) GROUP BY id"
+            if not self.fts:
+                return self._con.execute(f"""
+                    SELECT id, score FROM ({substring}) WHERE score > 0 ORDER BY score DESC, id LIMIT $limit
+                """, {"terms": terms, "limit": int(limit)}).df()
+            return self._con.execute(f"""
+                SELECT id, coalesce(b.score, 0) + s.score AS score
+                FROM ({substring}) s LEFT JOIN (
+                    SELECT id, fts_main_tools.match_bm25(id, $query) AS score FROM tools
+                ) b USING (id)
+                WHERE b.score IS NOT NULL OR s.score > 0 ORDER BY score DESC, id LIMIT $limit
+            """, {"terms": terms, "query": query, "limit": int(limit)}).df()
@@ -0,0 +1,87 @@
+import itertools
+import threading
+import time
+import pandas as pd
+
+from .replica import fetch_arrow
+
+# snapshot.py
+# Process-wide, read-only snapshot of a query result. The Arrow table and the
+# pandas frame converted from it are built once per table version and shared
+# by every session; callers get shallow copies where pandas makes that safe.
+# Derived frames (extra display columns and the like) are built once per
+# snapshot too, so per-rerun view code does no O(rows) Python work.
+# Every frame carries attrs["snapshot"], a token unique to the build it came
+# from (pandas keeps attrs through copies, slices and filters), so caches
+# downstream can tell the data is unchanged without hashing it.
+
+# Shallow copies share column buffers with the snapshot. Copy-on-Write (always
+# on from pandas 3.0, opt-in before) makes an in-place edit by one session copy
+# just the columns it touches, so the shared frame can never be modified through
+# them. Without it every caller gets a deep copy instead.
+def _copy_on_write():
+    return int(pd.__version__.split(".")[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _handout(df):
+    return df.copy(deep=not _copy_on_write())
+
+
+_tokens = itertools.count(1)
+
+
+class TableSnapshot:
+    def __init__(self, query, max_age=60, derived=None):
+        self.query = query
+        self.derived = derived or {}  # name -> function(frame) returning a new frame, run at each build
+        self.max_age = max_age      # Seconds before a rebuild even without a local write (other writers, e.g. admin uploads)
+        self.builds = 0
+        self._current = None        # (version, built monotonic, arrow table, frames by name), swapped atomically
+        self._read = False          # Whether arrow()/frame() served the current build (refresh() skips idle ones)
+        self._lock = threading.Lock()
+
+    def _fresh(self, current, version, margin=0):
+        return current is not None and current[0] == version and time.monotonic() - current[1] < self.max_age - margin
+
+    def _get(self, read, version, margin=0):
+        current = self._current
+        if self._fresh(current, version, margin): return current
+        with self._lock:
+            # Another session may have rebuilt it while we waited
+            current = self._current
+            if self._fresh(current, version, margin): return current
+            with read() as con:
+                table = fetch_arrow(con.execute(self.query))
+            frames = {None: table.to_pandas()}
+            for name, build in self.derived.items():
+                frames[name] = build(frames[None])
+            token = next(_tokens)
+            for frame in frames.values(): frame.attrs["snapshot"] = token
+            self._current = current = (version, time.monotonic(), table, frames)
+            self._read = False
+            self.builds += 1
+        return current
+
+    def refresh(self, read, version, margin):
+        """
+        Rebuilds the snapshot now if it would expire within `margin` seconds, so no reader waits on it.
+
+        A snapshot nobody has read since it was built is left to expire instead (the
+        next reader rebuilds it). Returns a frame of the new build, or None if none was made.
+        """
+        if self._current is not None and not self._read: return None
+        builds = self.builds
+        current = self._get(read, version, margin)
+        return _handout(current[3][None]) if self.builds != builds else None
+
+    def arrow(self, read, version):
+        """The shared pyarrow Table (immutable by construction)."""
+        current = self._get(read, version)
+        self._read = True
+        return current[2]
+
+    def frame(self, read, version, derived=None):
+        """A copy of the shared (or a derived) DataFrame: shallow under Copy-on-Write, so no data is copied unless the caller modifies it."""
+        current = self._get(read, version)
+        self._read = True
+        return _handout(current[3][derived])
@@ -101,7 +101,8 @@ def update_tools():
                 borrower VARCHAR,
                 return_date TIMESTAMP,
                 capabilities VARCHAR, 
-                safety_rating VARCHAR
+                safety_rating VARCHAR,
+                updated_at TIMESTAMP
             )
         """)
         
@@ -114,7 +115,8 @@ def update_tools():
                 NULL as borrower, 
                 NULL as return_date, 
                 capabilities, 
-                safety_rating 
+                safety_rating,
+                current_timestamp as updated_at
             FROM df_tools
         """)
         
@@ -0,0 +1,124 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import duckdb
+
+# bench_indexes.py
+# Times the hot query paths on a synthetic inventory with and without the
+# managed secondary indexes (core.data_manager.INDEXES), plus the candidates
+# that were left out, so the index set can be re-checked on new DuckDB releases.
+#
+#   python scripts/bench_indexes.py                    # 10k and 100k tools
+#   python scripts/bench_indexes.py --rows 50000 --repeat 20 > bench_output.txt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.data_manager import INDEXES, ensure_indexes
+
+# Indexes measured but not managed: low-cardinality or range-only columns
+CANDIDATES = {
+    "idx_tools_owner": ("tools", "owner"),
+    "idx_tools_status": ("tools", "status"),
+    "idx_history_tool_date": ("tool_history", "tool_id, change_date"),
+    "idx_sessions_expires": ("sessions", "expires_at"),
+    "idx_audit_timestamp": ("audit_logs", "timestamp"),
+}
+
+OWNERS = 40
+HISTORY_PER_TOOL = 5
+
+# name -> (sql, params, mutates). Mutating statements run inside a rolled-back transaction.
+QUERIES = {
+    "my_tools (owner =)": ("SELECT * FROM tools WHERE owner = ? ORDER BY name", ["Member 7"], False),
+    "borrowed (borrower =)": ("SELECT id, name, return_date FROM tools WHERE borrower = ?", ["Member 3"], False),
+    "available (status =)": ("SELECT count(*) FROM tools WHERE status = 'Available'", [], False),
+    "tool_history (tool_id =)": ("SELECT changed_by, change_date FROM tool_history WHERE tool_id = ? ORDER BY change_date DESC", ["TOOL_000042"], False),
+    "purge_old_history": ("DELETE FROM tool_history WHERE change_date < current_timestamp - INTERVAL 30 DAY", [], True),
+    "clean_old_sessions": ("DELETE FROM sessions WHERE expires_at < current_timestamp", [], True),
+    "recent audit_logs": ("SELECT * FROM audit_logs WHERE timestamp > current_timestamp - INTERVAL 1 HOUR", [], False),
+}
+
+
+def build(rows, indexes):
+    con = duckdb.connect(':memory:')
+    con.execute(f"""
+        CREATE TABLE tools AS SELECT
+            printf('TOOL_%06d', i) AS id, 'Tool ' || i AS name, 'Brand' AS brand, 'M' || i AS model_no,
+            'Member ' || (i % {OWNERS}) AS owner, 'Main' AS household,
+            CASE WHEN i % 10 = 0 THEN 'Borrowed' WHEN i % 97 = 0 THEN 'Retired' ELSE 'Available' END AS status,
+            CASE WHEN i % 10 = 0 THEN 'Member ' || ((i // 10) % {OWNERS}) END AS borrower,
+            CASE WHEN i % 10 = 0 THEN current_date::TIMESTAMP + INTERVAL 7 DAY END AS return_date,
+            'Garage' AS bin_location, false AS is_stationary, 'Standard' AS safety_rating,
+            current_timestamp::TIMESTAMP AS updated_at
+        FROM range({rows}) t(i)""")
+    con.execute(f"""
+        CREATE TABLE tool_history AS SELECT
+            uuid()::VARCHAR AS history_id, printf('TOOL_%06d', i // {HISTORY_PER_TOOL}) AS tool_id, 'Member 1' AS changed_by,
+            current_timestamp::TIMESTAMP - to_days(CAST(i % 90 AS INTEGER)) AS change_date, '{{}}'::JSON AS previous_state
+        FROM range({rows * HISTORY_PER_TOOL}) t(i)""")
+    con.execute(f"""
+        CREATE TABLE sessions AS SELECT
+            uuid()::VARCHAR AS token, 'user' || i || '@example.com' AS email,
+            current_timestamp::TIMESTAMP + to_days(CAST(i % 60 AS INTEGER) - 30) AS expires_at
+        FROM range({rows // 10}) t(i)""")
+    con.execute(f"""
+        CREATE TABLE audit_logs AS SELECT
+            uuid()::VARCHAR AS log_id, current_timestamp::TIMESTAMP - to_minutes(CAST(i AS BIGINT)) AS timestamp,
+            'LOGIN' AS event_type, 'user@example.com' AS user_email, '' AS details
+        FROM range({rows}) t(i)""")
+    # Same primary keys as DataManager._init_schema
+    for table, key in (("tools", "id"), ("sessions", "token"), ("audit_logs", "log_id")):
+        con.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({key})")
+    if indexes is INDEXES:
+        missing = ensure_indexes(con)
+        if missing: raise RuntimeError(f"Indexes not created: {missing}")
+    elif indexes:
+        for name, (table, cols) in indexes.items():
+            con.execute(f"CREATE INDEX {name} ON {table} ({cols})")
+    return con
+
+
+def time_query(con, sql, params, mutates, repeat):
+    samples = []
+    for _ in range(repeat):
+        if mutates: con.execute("BEGIN")
+        start = time.perf_counter()
+        con.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+        if mutates: con.execute("ROLLBACK")
+    return statistics.median(samples)
+
+
+def uses_index(con, sql, params):
+    # The scan type is only settled at execution time, so plain EXPLAIN always reports a sequential scan
+    con.execute("BEGIN")
+    plan = "\n".join(r[1] for r in con.execute(f"EXPLAIN ANALYZE {sql}", params).fetchall())
+    con.execute("ROLLBACK")
+    return "Index Scan" in plan
+
+
+def run(rows, repeat):
+    variants = {"no index": build(rows, None), "managed": build(rows, INDEXES), "all candidates": build(rows, CANDIDATES | INDEXES)}
+    print(f"\n## {rows:,} tools ({rows * HISTORY_PER_TOOL:,} history rows), median ms of {repeat} runs")
+    print(f"{'query':<28}" + "".join(f"{label:>16}" for label in variants) + "  plan (all candidates)")
+    for name, (sql, params, mutates) in QUERIES.items():
+        times = [time_query(con, sql, params, mutates, repeat) for con in variants.values()]
+        plan = "index scan" if uses_index(variants["all candidates"], sql, params) else "seq scan"
+        print(f"{name:<28}" + "".join(f"{t:>16.2f}" for t in times) + f"  {plan}")
+
+    # Indexes are maintained on every write, so price that in too
+    sql = "UPDATE tools SET status = 'Borrowed', borrower = 'Member 1' WHERE id IN (SELECT id FROM tools USING SAMPLE 1000 ROWS)"
+    times = [time_query(con, sql, [], True, repeat) for con in variants.values()]
+    print(f"{'1000-row loan UPDATE':<28}" + "".join(f"{t:>16.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the managed DuckDB indexes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+    print(f"DuckDB {duckdb.__version__}; managed: {', '.join(INDEXES)}; candidates: {', '.join(CANDIDATES)}")
+    for n in args.rows:
+        run(n, args.repeat)
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# webhook_sink.py
+# Local stand-in for a Discord webhook, for exercising the alert dispatcher offline.
+#
+#   python scripts/webhook_sink.py --port 8765                 # just receive and print
+#   python scripts/webhook_sink.py --burst 500 --fail-rate 0.2 # drive AlertDispatcher at it and report
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class WebhookSink:
+    """Threaded HTTP server that records every JSON payload POSTed to it."""
+
+    def __init__(self, port=0, latency=0.0, fail_rate=0.0, rate_limit_every=0):
+        self.received = []
+        self.requests = 0
+        self.latency = latency                    # Seconds to stall each request
+        self.fail_rate = fail_rate                # Fraction of requests answered with a 500
+        self.rate_limit_every = rate_limit_every  # Answer every Nth request with a 429
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with sink._lock:
+                    sink.requests += 1
+                    n = sink.requests
+                if sink.latency: time.sleep(sink.latency)
+                if sink.rate_limit_every and n % sink.rate_limit_every == 0:
+                    self._reply(429, {"retry_after": 0.05})
+                elif sink.fail_rate and (n * 7919 % 100) < sink.fail_rate * 100: # Deterministic spread
+                    self._reply(500, {"message": "simulated failure"})
+                else:
+                    with sink._lock:
+                        sink.received.append(json.loads(body or b"{}"))
+                    self._reply(204, None)
+
+            def _reply(self, code, payload):
+                data = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_burst(args):
+    from core.alerts import AlertDispatcher
+
+    sink = WebhookSink(latency=args.latency, fail_rate=args.fail_rate, rate_limit_every=args.rate_limit_every).start()
+    dispatcher = AlertDispatcher(sink.url, max_queue=args.queue, min_interval=args.min_interval,
+                                 coalesce_window=args.window, backoff=0.05)
+    start = time.perf_counter()
+    for i in range(args.burst):
+        dispatcher.submit(["FAILED_LOGIN", "ADMIN_UPDATE"][i % 2], f"user{i}@example.com", f"event {i}")
+    enqueue_ms = (time.perf_counter() - start) * 1000
+    dispatcher.flush(timeout=120)
+    total_s = time.perf_counter() - start
+    sink.stop()
+
+    print(f"Submitted {args.burst} events in {enqueue_ms:.1f} ms ({enqueue_ms * 1000 / max(args.burst, 1):.1f} us/event)")
+    print(f"Drained in {total_s:.2f} s; webhook requests: {sink.requests}, messages accepted: {len(sink.received)}")
+    print(f"Dispatcher stats: {dispatcher.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Discord webhook stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to stall each request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests that return 500")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Return 429 on every Nth request")
+    parser.add_argument("--burst", type=int, default=0, help="Send this many alerts through AlertDispatcher and report")
+    parser.add_argument("--queue", type=int, default=200, help="Dispatcher queue size for --burst")
+    parser.add_argument("--window", type=float, default=0.5, help="Dispatcher coalesce window for --burst")
+    parser.add_argument("--min-interval", type=float, default=0.1, help="Dispatcher rate limit for --burst")
+    args = parser.parse_args()
+
+    if args.burst:
+        run_burst(args)
+    else:
+        sink = WebhookSink(args.port, args.latency, args.fail_rate, args.rate_limit_every)
+        print(f"Listening on {sink.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                sink.server.handle_request()
+                if sink.received: print(json.dumps(sink.received.pop(), ensure_ascii=False))
+        except KeyboardInterrupt:
+            sink.server.server_close()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.ai_cache import ResponseStore
+
+
+class TestResponseStore(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        store = ResponseStore(":memory:")
+        self.assertIsNone(store.get("prompt", "model-a"))
+        store.put("prompt", "model-a", '{"ok": true}')
+        self.assertEqual(store.get("prompt", "model-a"), '{"ok": true}')
+        self.assertIsNone(store.get("prompt", "model-b")) # Keyed by model too
+        self.assertEqual((store.hits, store.misses), (1, 2))
+
+    def test_expired_entries_are_not_served(self):
+        store = ResponseStore(":memory:")
+        store.put("p", "m", "old", ttl=-1)
+        self.assertIsNone(store.get("p", "m"))
+
+    def test_least_recently_used_go_first(self):
+        store = ResponseStore(":memory:", max_entries=2)
+        store.put("a", "m", "A")
+        store.put("b", "m", "B")
+        store.get("a", "m")
+        store.put("c", "m", "C")
+        self.assertEqual([store.get(p, "m") for p in "abc"], ["A", None, "C"])
+        self.assertEqual(store.evictions, 1)
+
+    def test_size_ceiling(self):
+        store = ResponseStore(":memory:", max_bytes=100)
+        for p in "abc":
+            store.put(p, "m", p * 40)
+        self.assertLessEqual(store.stats()["bytes"], 100)
+
+    def test_survives_a_restart(self):
+        path = os.path.join(tempfile.mkdtemp(), "ai_cache.db")
+        first = ResponseStore(path)
+        first.put("p", "m", "answer")
+        first.con.close()
+        self.assertEqual(ResponseStore(path).get("p", "m"), "answer")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.alerts import AlertDispatcher, format_alert
+from scripts.webhook_sink import WebhookSink
+
+
+class TestAlertDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.sink = WebhookSink().start()
+
+    def tearDown(self):
+        self.sink.stop()
+
+    def _dispatcher(self, **kwargs):
+        opts = dict(min_interval=0, coalesce_window=0.2, backoff=0.01)
+        opts.update(kwargs)
+        return AlertDispatcher(self.sink.url, **opts)
+
+    def test_burst_is_coalesced_into_one_digest_per_type(self):
+        d = self._dispatcher()
+        for i in range(5):
+            d.submit("FAILED_LOGIN", f"user{i}@example.com", "Bad Password")
+        d.submit("ADMIN_UPDATE", "admin@example.com", "MOVE on Drill")
+        self.assertTrue(d.flush(timeout=5))
+        contents = sorted(msg["content"] for msg in self.sink.received)
+        self.assertEqual(contents, ["🚨 **ADMIN_UPDATE**", "🚨 **FAILED_LOGIN** x5"])
+        self.assertEqual(d.stats["coalesced"], 4)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        post = MagicMock()
+        d = AlertDispatcher("http://unused", max_queue=2, coalesce_window=0.5, post=post)
+        results = [d.submit("FAILED_LOGIN", "x@example.com", str(i)) for i in range(10)]
+        self.assertIn(False, results)
+        self.assertEqual(d.stats["dropped"], results.count(False))
+
+    def test_server_errors_are_retried(self):
+        self.sink.fail_rate = 1.0
+        d = self._dispatcher(max_retries=2)
+        d.submit("FAILED_LOGIN", "x@example.com", "Bad Password")
+        self.assertTrue(d.flush(timeout=5))
+        self.assertEqual(self.sink.requests, 3)
+        self.assertEqual(d.stats["failed"], 1)
+
+    def test_digest_is_truncated(self):
+        payload = format_alert("FAILED_LOGIN", [("x@example.com", "Bad Password")] * 25)
+        self.assertIn("...and 15 more", payload["embeds"][0]["description"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import time
+import duckdb
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.audit_buffer import AuditBuffer
+from core.db_pool import CursorPool
+
+
+class TestAuditBuffer(unittest.TestCase):
+    def setUp(self):
+        self.con = duckdb.connect(':memory:')
+        self.con.execute("CREATE TABLE audit_logs (log_id VARCHAR PRIMARY KEY, timestamp TIMESTAMP, event_type VARCHAR, user_email VARCHAR, details VARCHAR)")
+        self.pool = CursorPool(self.con, size=2)
+
+    def _count(self):
+        return self.con.execute("SELECT count(*) FROM audit_logs").fetchone()[0]
+
+    def test_events_wait_for_flush(self):
+        buf = AuditBuffer(self.pool.lease, max_events=100, max_age=60)
+        for i in range(3):
+            buf.add("LOGIN", f"user{i}@example.com", "Successful login")
+        self.assertEqual(self._count(), 0)
+        self.assertEqual(buf.flush(), 3)
+        self.assertEqual(self._count(), 3)
+        buf.close()
+
+    def test_size_threshold_triggers_background_flush(self):
+        buf = AuditBuffer(self.pool.lease, max_events=2, max_age=60)
+        buf.add("LOGIN", "a@example.com", "ok")
+        buf.add("LOGIN", "b@example.com", "ok")
+        deadline = time.monotonic() + 2
+        while self._count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._count(), 2)
+        buf.close()
+
+    def test_failed_flush_keeps_events(self):
+        buf = AuditBuffer(self.pool.lease, max_events=100, max_age=60)
+        self.con.execute("ALTER TABLE audit_logs RENAME TO audit_logs_moved")
+        buf.add("FAILED_LOGIN", "x@example.com", "Bad Password")
+        self.assertEqual(buf.flush(), 0)
+        self.assertIsNotNone(buf.last_error)
+        self.con.execute("ALTER TABLE audit_logs_moved RENAME TO audit_logs")
+        self.assertEqual(buf.flush(), 1)
+        buf.close()
+
+    def test_events_use_the_database_clock(self):
+        self.con.execute("SET GLOBAL TimeZone = 'America/Denver'") # Not the host's zone
+        buf = AuditBuffer(self.pool.lease, max_events=100, max_age=60)
+        buf.add("LOGIN", "a@example.com", "ok")
+        buf.flush()
+        skew = self.con.execute("SELECT abs(epoch(current_timestamp::TIMESTAMP) - epoch(timestamp)) FROM audit_logs").fetchone()[0]
+        self.assertLess(skew, 60)
+        buf.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,35 @@
 import unittest
+import json
+import tempfile
 from unittest.mock import MagicMock, patch
 import sys
 import os
 import pandas as pd
+import duckdb  # Imported before the streamlit mock so patch.dict doesn't unload its submodules
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Mock streamlit before importing data_manager
 with patch.dict(sys.modules, {'streamlit': MagicMock()}):
+    from core import data_manager
     from core.data_manager import DataManager
+    from core.replica import ReadReplica
+
+
+def make_local_dm():
+    """Builds a DataManager on a real in-memory DuckDB (local mode, no MotherDuck token)."""
+    with patch('duckdb.connect', return_value=duckdb.connect(':memory:')):
+        with patch.object(data_manager.st, 'secrets', {}):
+            return DataManager()
+
+
+def insert_tool(dm, tool_id, status='Available', borrower=None, owner='Alice', name=None):
+    dm.con.execute("""
+        INSERT INTO tools (id, name, brand, model_no, power_source, owner, household, bin_location,
+                           is_stationary, status, borrower, return_date, capabilities, safety_rating, updated_at)
+        VALUES (?, ?, 'Brand', 'M1', 'Manual', ?, 'Main House', 'Shelf', false, ?, ?, NULL, 'cuts', 'Open', current_timestamp)
+    """, [tool_id, name or f"Tool {tool_id}", owner, status, borrower])
 
 
 class TestDataManager(unittest.TestCase):
@@ -46,5 +66,387 @@ class TestDataManager(unittest.TestCase):
         # We expect at least 5 calls to create tables
         self.assertGreaterEqual(self.dm.con.execute.call_count, 5)
 
+    def test_motherduck_needs_an_explicit_archive_dir(self):
+        with patch('duckdb.connect', return_value=MagicMock()), \
+             patch.object(data_manager.st, 'secrets', {"MOTHERDUCK_TOKEN": "fake_token"}):
+            dm = DataManager()
+        self.assertIsNone(dm.archive_dir) # No local "archive" default on an ephemeral host
+
+    def test_invalidate_is_table_scoped(self):
+        before = dict(self.dm._versions)
+        self.dm.invalidate("tools")
+        self.assertEqual(self.dm.table_version("tools"), before["tools"] + 1)
+        self.assertEqual(self.dm.table_version("family"), before["family"])
+        self.assertEqual(self.dm.table_version("history"), before["history"])
+
+    def test_clear_cache_bumps_every_table(self):
+        before = dict(self.dm._versions)
+        self.dm.clear_cache()
+        for table in DataManager.CACHED_TABLES:
+            self.assertEqual(self.dm.table_version(table), before[table] + 1)
+
+class TestMaintenance(unittest.TestCase):
+    def test_prewarm_inside_the_window_does_not_rebuild(self):
+        dm = make_local_dm()
+        insert_tool(dm, "T1")
+        dm.prewarm()
+        dm.get_all_tools() # A reader, so the snapshot isn't idle
+        dm.prewarm()
+        self.assertEqual(dm.tools_snapshot.builds, 1)
+
+    def test_archive_job_needs_an_archive_location(self):
+        dm = make_local_dm()
+        dm.archive_dir = None
+        with patch.object(data_manager.MaintenanceScheduler, 'start'):
+            jobs = dm.start_maintenance().jobs
+        self.assertNotIn("archive_cold_rows", jobs)
+        self.assertIn("compact_history", jobs)
+
+class TestIndexes(unittest.TestCase):
+    def test_managed_indexes_exist_after_init(self):
+        dm = make_local_dm()
+        self.assertEqual(dm.missing_indexes, [])
+        self.assertEqual(data_manager.ensure_indexes(dm.con), []) # Idempotent on restart
+
+    def test_point_lookup_uses_index(self):
+        dm = make_local_dm()
+        dm.con.execute("INSERT INTO tool_history (history_id, tool_id, change_date) SELECT uuid()::VARCHAR, 'T' || (range // 5), current_timestamp FROM range(50000)")
+        plan = dm.con.execute("EXPLAIN ANALYZE SELECT * FROM tool_history WHERE tool_id = 'T42'").fetchall()[0][1]
+        self.assertIn("Index Scan", plan)
+
+    def test_single_tool_replay_uses_index(self):
+        dm = make_local_dm()
+        dm.con.execute("INSERT INTO tool_history (history_id, tool_id, change_date, kind) SELECT uuid()::VARCHAR, 'T' || (range // 5), current_timestamp, 'create' FROM range(50000)")
+        replay = data_manager.state_sql("SELECT $1::VARCHAR AS tool_id, $2::TIMESTAMP AS ts", tool_id="$1::VARCHAR")
+        plan = dm.con.execute(f"EXPLAIN ANALYZE SELECT * FROM ({replay})", ["T42", "2024-01-01"]).fetchall()[0][1]
+        self.assertIn("Index Scan", plan)
+
+class TestDisplayColumns(unittest.TestCase):
+    def test_derived_columns_match_the_row_rules(self):
+        now = pd.Timestamp.now()
+        tools = pd.DataFrame({
+            'household': ['Main', 'Cabin', 'Main'], 'bin_location': ['Shelf', 'Shed', 'Attic'],
+            'is_stationary': [True, None, False], 'status': ['Borrowed', 'Borrowed', 'Available'],
+            'borrower': ['Bob', 'Carol', None],
+            'return_date': [now - pd.Timedelta(days=3), now + pd.Timedelta(days=1, hours=1), pd.NaT],
+        })
+        df = data_manager.add_display_columns(tools)
+        self.assertEqual(df['Location Info'].tolist(), ['Main (Shelf) ⚓ [Fixed]', 'Cabin (Shed)', 'Main (Attic)'])
+        self.assertEqual(df['Display Status'].tolist(), ['⛔ With Bob', '⛔ With Carol', '✅ Available'])
+        self.assertEqual(df['Due Status'].tolist()[:2], ['🔴 Overdue', '🟠 Due Soon'])
+        self.assertTrue(pd.isna(df['Due Status'].iloc[2])) # Not on loan
+        self.assertEqual(df['transportable'].tolist(), [False, True, True])
+        self.assertNotIn('Location Info', tools.columns)
+
+class TestQueryTools(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for i, owner in enumerate(["Alice", "Bob", "Alice", "Cara", "Alice"]):
+            insert_tool(self.dm, f"T{i}", owner=owner, name=f"Tool {4 - i}")
+
+    def test_filter_sort_and_page(self):
+        page, total = self.dm.query_tools({'owner': 'Alice'}, sort='name', offset=1, limit=1, columns=['id', 'name'])
+        self.assertEqual(total, 3)
+        self.assertEqual(page.to_dict('records'), [{'id': 'T2', 'name': 'Tool 2'}])
+
+    def test_list_filter_and_descending_sort(self):
+        page, total = self.dm.query_tools({'id': ['T0', 'T3']}, sort=[('name', False)], columns=['id'])
+        self.assertEqual((total, page['id'].tolist()), (2, ['T0', 'T3']))
+
+    def test_id_list_order_is_kept_without_a_sort(self):
+        page, _ = self.dm.query_tools({'id': ['T3', 'T0', 'T4', 'T0']}, columns=['id'])
+        self.assertEqual(page['id'].tolist(), ['T3', 'T0', 'T4'])
+
+    def test_search_tools_returns_ranked_display_rows(self):
+        hits = self.dm.search_tools("tool 3")
+        self.assertEqual(hits['id'].iloc[0], 'T1') # 'Tool 3'; every tool matches 'tool'
+        self.assertIn('Display Status', hits.columns)
+
+    def test_display_columns_and_unknown_columns(self):
+        page, _ = self.dm.query_tools(columns=['Display Status'])
+        self.assertEqual(set(page['Display Status']), {'✅ Available'})
+        with self.assertRaises(ValueError):
+            self.dm.query_tools(sort='name; DROP TABLE tools')
+
+class TestBulkLoans(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for tid in ["T1", "T2", "T3"]:
+            insert_tool(self.dm, tid)
+        self.dm.con.execute("UPDATE tools SET status = 'Borrowed', borrower = 'Bob', return_date = current_date WHERE id = 'T3'")
+
+    def _status(self, tool_id):
+        return self.dm.con.execute("SELECT status, borrower FROM tools WHERE id = ?", [tool_id]).fetchone()
+
+    def test_borrow_tools_reports_per_id_outcomes(self):
+        outcomes = self.dm.borrow_tools(["T1", "T2", "T3", "MISSING"], "Carol", 3)
+        self.assertEqual(outcomes, {"T1": True, "T2": True, "T3": False, "MISSING": False})
+        self.assertEqual(self._status("T1"), ("Borrowed", "Carol"))
+        self.assertEqual(self._status("T3"), ("Borrowed", "Bob"))
+
+    def test_return_tools_is_one_statement(self):
+        self.dm.borrow_tools(["T1"], "Carol", 3)
+        with self.dm.cursor() as cur:
+            spy = MagicMock(wraps=cur)
+            self.dm._pool._local.cursor = spy # Nested leases on this thread now hand out the spy
+            outcomes = self.dm.return_tools(["T1", "T2", "T3"])
+            self.dm._pool._local.cursor = cur
+        self.assertEqual(spy.execute.call_count, 1)
+        self.assertEqual(outcomes, {"T1": True, "T2": False, "T3": True})
+        self.assertEqual(self._status("T3"), ("Available", None))
+
+    def test_extend_loans_only_touches_active_loans(self):
+        before = self.dm.con.execute("SELECT return_date FROM tools WHERE id = 'T3'").fetchone()[0]
+        outcomes = self.dm.extend_loans(["T2", "T3"], 2)
+        self.assertEqual(outcomes, {"T2": False, "T3": True})
+        after = self.dm.con.execute("SELECT return_date FROM tools WHERE id = 'T3'").fetchone()[0]
+        self.assertEqual((after - before).days, 2)
+
+    def test_empty_batch_skips_the_database(self):
+        version = self.dm.table_version("tools")
+        self.assertEqual(self.dm.return_tools([]), {})
+        self.assertEqual(self.dm.table_version("tools"), version)
+
+class TestBatchUpdate(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for tid in ["T1", "T2", "T3"]:
+            insert_tool(self.dm, tid)
+        self.original = self.dm.con.execute("SELECT * FROM tools ORDER BY id").df()
+
+    def test_only_changed_rows_are_written_and_archived(self):
+        edited = self.original.copy()
+        edited.loc[edited['id'] == 'T2', 'bin_location'] = 'Garage'
+        saved = self.dm.batch_update_tools(edited, "Alice", original_df=self.original)
+        self.assertEqual(saved, 1)
+        self.assertEqual(self.dm.con.execute("SELECT bin_location FROM tools WHERE id = 'T2'").fetchone()[0], 'Garage')
+        history = self.dm.con.execute("SELECT tool_id, changed_by, changes FROM tool_history").fetchall()
+        self.assertEqual(history, [("T2", "Alice", [{"field": "bin_location", "old_value": "Shelf", "new_value": "Garage"}])])
+
+    def test_untouched_table_is_a_no_op(self):
+        self.assertEqual(self.dm.batch_update_tools(self.original.copy(), "Alice", original_df=self.original), 0)
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tool_history").fetchone()[0], 0)
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for tid in ["T1", "T2", "T3"]:
+            insert_tool(self.dm, tid)
+
+    def test_reassign_records_only_changed_fields(self):
+        self.dm.batch_reassign_tools(["T1", "T3"], "Dana", "Cabin")
+        rows = self.dm.con.execute("""
+            SELECT tool_id, changed_by, kind, list_transform(changes, c -> [c.field, c.old_value, c.new_value]), previous_state
+            FROM tool_history ORDER BY tool_id
+        """).fetchall()
+        changes = [["owner", "Alice", "Dana"], ["household", "Main House", "Cabin"]]
+        self.assertEqual(rows, [("T1", "System Reassign to Dana", "delta", changes, None),
+                                ("T3", "System Reassign to Dana", "delta", changes, None)])
+        owners = self.dm.con.execute("SELECT id, owner FROM tools ORDER BY id").fetchall()
+        self.assertEqual(owners, [("T1", "Dana"), ("T2", "Alice"), ("T3", "Dana")])
+
+    def test_no_op_update_writes_no_history(self):
+        self.dm.update_tool_location("T1", "Shelf", "Main House", "Alice")
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tool_history").fetchone()[0], 0)
+
+    def test_failed_update_rolls_back_with_its_history(self):
+        with self.assertRaises(RuntimeError):
+            with self.dm._tracked(["T1"], "Alice") as con:
+                con.execute("UPDATE tools SET bin_location = 'Garage' WHERE id = 'T1'")
+                raise RuntimeError("boom")
+        self.assertEqual(self.dm.con.execute("SELECT bin_location FROM tools WHERE id = 'T1'").fetchone()[0], "Shelf")
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tool_history").fetchone()[0], 0)
+
+    def test_compaction_folds_old_deltas_into_a_checkpoint(self):
+        self.dm.update_tool_location("T1", "Garage", "Cabin", "Alice")
+        self.dm.update_tool_location("T1", "Attic", "Cabin", "Bob")
+        self.dm.retire_tool("T2", "rusty", "Bob")
+        self.dm.con.execute("UPDATE tool_history SET change_date = change_date - INTERVAL 200 DAY WHERE tool_id = 'T1'")
+
+        self.assertEqual(self.dm.compact_history(90), 2)
+        rows = self.dm.con.execute("SELECT tool_id, kind, changed_by, previous_state FROM tool_history ORDER BY tool_id").fetchall()
+        self.assertEqual([r[:3] for r in rows], [("T1", "checkpoint", "Alice, Bob"), ("T2", "delta", "Bob")])
+        state = json.loads(rows[0][3])
+        self.assertEqual((state["bin_location"], state["household"], state["is_stationary"]), ("Shelf", "Main House", False))
+
+    def test_checkpoints_leave_out_unrecorded_loan_fields(self):
+        self.dm.update_tool_location("T1", "Garage", "Cabin", "Alice")
+        self.dm.update_tool_location("T1", "Attic", "Cabin", "Bob")
+        self.dm.retire_tool("T2", "rusty", "Bob")
+        self.dm.update_tool_location("T2", "Dump", "Main House", "Bob")
+        self.dm.borrow_tools(["T1"], "Carol", 7) # Not versioned: must not be frozen into the checkpoint
+        self.dm.con.execute("UPDATE tool_history SET change_date = change_date - INTERVAL 200 DAY")
+
+        self.assertEqual(self.dm.compact_history(90), 4)
+        states = dict(self.dm.con.execute("SELECT tool_id, previous_state FROM tool_history").fetchall())
+        t1, t2 = json.loads(states["T1"]), json.loads(states["T2"])
+        self.assertNotIn("borrower", t1)
+        self.assertNotIn("status", t1)
+        self.assertEqual((t1["bin_location"], t2["status"]), ("Shelf", "Available"))
+        self.assertNotIn("borrower", t2)
+
+    def test_delete_tools_keeps_a_snapshot(self):
+        self.dm.delete_tools(["T2"], "Admin")
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tools").fetchone()[0], 2)
+        state = self.dm.con.execute("SELECT previous_state->>'name' FROM tool_history WHERE tool_id = 'T2'").fetchone()[0]
+        self.assertEqual(state, "Tool T2")
+
+    def test_delete_tools_is_atomic_and_audited_per_tool(self):
+        self.dm.delete_tools(["T1", "T2"], "Admin")
+        logs = self.dm.con.execute("SELECT details FROM audit_logs WHERE event_type = 'ADMIN_DELETE' ORDER BY details").fetchall()
+        self.assertEqual(logs, [("Permanently deleted tool T1",), ("Permanently deleted tool T2",)])
+
+        self.dm.con.execute("DROP TABLE audit_logs") # The audit insert fails: nothing else may stick
+        with self.assertRaises(duckdb.Error):
+            self.dm.delete_tools(["T3"], "Admin")
+        self.assertEqual(self.dm.con.execute("SELECT id FROM tools").fetchall(), [("T3",)])
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tool_history WHERE tool_id = 'T3'").fetchone()[0], 0)
+
+class TestAsOf(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for tid in ["T1", "T2"]:
+            insert_tool(self.dm, tid)
+        self.dm.update_tool_location("T1", "Garage", "Cabin", "Alice")
+        self.dm.update_tool_location("T1", "Attic", "Cabin", "Bob")
+        self.dm.delete_tools(["T2"], "Admin")
+        self.dm.add_tool({"name": "Drill", "owner": "Bob", "household": "Cabin"}, "Bob")
+        # Spread the records a day apart: T1 moved on day 1 and 2, T2 deleted on day 3, Drill added on day 4
+        self.dm.con.execute("""
+            UPDATE tool_history SET change_date = TIMESTAMP '2024-01-01' + INTERVAL 1 DAY * n FROM (
+                SELECT history_id AS hid, row_number() OVER (ORDER BY change_date, kind) AS n FROM tool_history
+            ) WHERE history_id = hid
+        """)
+
+    def test_tool_state_between_changes(self):
+        self.assertIsNone(self.dm.get_tool_as_of("T1", "2024-01-01 12:00")) # Before the first record: nothing is known
+        self.assertEqual(self.dm.get_tool_as_of("T1", "2024-01-02 12:00")["bin_location"], "Garage")
+        self.assertEqual(self.dm.get_tool_as_of("T1", "2024-01-03 12:00")["household"], "Cabin")
+
+    def test_deleted_and_unborn_tools(self):
+        self.assertEqual(self.dm.get_tool_as_of("T2", "2024-01-02")["name"], "Tool T2")
+        self.assertIsNone(self.dm.get_tool_as_of("T2", "2024-01-05"))
+        drill = self.dm.con.execute("SELECT id FROM tools WHERE name = 'Drill'").fetchone()[0]
+        self.assertIsNone(self.dm.get_tool_as_of(drill, "2024-01-02"))
+
+class TestColdTier(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        self.dm.archive_dir = tempfile.mkdtemp()
+        for tid in ["T1", "T2"]:
+            insert_tool(self.dm, tid)
+        self.dm.update_tool_location("T1", "Garage", "Cabin", "Alice")
+        self.dm.update_tool_location("T2", "Garage", "Cabin", "Alice")
+        self.dm.con.execute("UPDATE tool_history SET change_date = TIMESTAMP '2024-03-15' WHERE tool_id = 'T1'")
+
+    def test_old_history_moves_to_partitioned_parquet(self):
+        self.assertEqual(self.dm.purge_old_history(30), 1)
+        self.assertEqual(self.dm.con.execute("SELECT tool_id FROM tool_history").fetchall(), [("T2",)])
+        files = self.dm.con.execute("SELECT file FROM glob(?)", [f"{self.dm.archive_dir}/tool_history/**/*.parquet"]).fetchall()
+        self.assertEqual(len(files), 1)
+        self.assertIn(os.path.join("year=2024", "month=3"), files[0][0])
+
+    def test_archived_rows_stay_queryable(self):
+        self.dm.con.execute("INSERT INTO tool_history (history_id, tool_id, change_date, kind) VALUES ('h0', 'T0', TIMESTAMP '2024-01-01', 'create')")
+        self.dm.purge_old_history(30)
+        source = data_manager.with_archive(self.dm.con, "tool_history", self.dm.archive_dir)
+        rows = self.dm.con.execute(f"SELECT tool_id, changes[1].new_value FROM {source} WHERE kind = 'delta' ORDER BY tool_id").fetchall()
+        self.assertEqual(rows, [("T1", "Cabin"), ("T2", "Cabin")])
+        self.assertEqual(self.dm.get_tool_as_of("T1", "2024-03-01")["bin_location"], "Shelf")
+
+    def test_hot_row_without_id_keeps_archive_visible(self):
+        self.dm.purge_old_history(30)
+        self.dm.con.execute("INSERT INTO tool_history (tool_id, change_date, kind) VALUES ('T3', current_timestamp, 'create')")
+        source = data_manager.with_archive(self.dm.con, "tool_history", self.dm.archive_dir)
+        rows = self.dm.con.execute(f"SELECT tool_id FROM {source} ORDER BY tool_id").fetchall()
+        self.assertEqual(rows, [("T1",), ("T2",), ("T3",)])
+
+    def test_scheduled_archive_compacts_before_moving_rows(self):
+        self.dm.update_tool_location("T1", "Attic", "Cabin", "Bob")
+        self.dm.update_tool_location("T2", "Attic", "Cabin", "Bob")
+        # T1: two moves past the archive window; T2: two moves inside it but past the compaction window
+        self.dm.con.execute("UPDATE tool_history SET change_date = TIMESTAMP '2024-03-15' WHERE tool_id = 'T1'")
+        self.dm.con.execute("UPDATE tool_history SET change_date = date_trunc('day', current_timestamp - INTERVAL 20 DAY) WHERE tool_id = 'T2'")
+        self.dm.archive_cold_rows()
+        source = data_manager.with_archive(self.dm.con, "tool_history", self.dm.archive_dir)
+        rows = self.dm.con.execute(f"SELECT tool_id, kind FROM {source} ORDER BY tool_id").fetchall()
+        self.assertEqual(rows, [("T1", "checkpoint"), ("T2", "checkpoint")])
+        self.assertEqual(self.dm.con.execute("SELECT tool_id FROM tool_history").fetchall(), [("T2",)])
+        self.assertEqual(self.dm.get_tool_as_of("T2", "2024-06-01")["bin_location"], "Shelf")
+
+    def test_nothing_is_deleted_without_an_archive_location(self):
+        self.dm.archive_dir = None
+        with self.assertLogs(data_manager.logger, "WARNING"):
+            self.assertEqual(self.dm.purge_old_history(30), 0)
+        self.assertEqual(self.dm.con.execute("SELECT count(*) FROM tool_history").fetchone()[0], 2)
+
+    def test_audit_logs_are_tiered_too(self):
+        self.dm.log_event("LOGIN", "a@example.com", "old")
+        self.dm.audit.flush()
+        self.dm.con.execute("UPDATE audit_logs SET timestamp = TIMESTAMP '2023-01-01'")
+        self.dm.log_event("LOGIN", "a@example.com", "new")
+        self.assertEqual(self.dm.archive_old_rows("audit_logs", 90), 1)
+        self.assertEqual(self.dm.get_audit_logs(7)["details"].tolist(), ["new"])
+        self.assertEqual(self.dm.get_audit_logs(5000, include_archive=True)["details"].tolist(), ["new", "old"])
+
+class TestReadReplica(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        for tid in ["T1", "T2"]:
+            insert_tool(self.dm, tid)
+        self.replica = ReadReplica(':memory:')
+
+    def _local(self, sql):
+        return self.replica.con.execute(sql).fetchall()
+
+    def test_first_sync_copies_tables(self):
+        self.assertTrue(self.replica.refresh(self.dm.con, (0, 0, 0)))
+        self.assertEqual(self._local("SELECT id FROM tools ORDER BY id"), [("T1",), ("T2",)])
+
+    def test_writes_are_picked_up_incrementally(self):
+        self.replica.refresh(self.dm.con, (0, 0, 0))
+        self.dm.update_tool_location("T1", "Garage", "Cabin", "Alice")
+        self.dm.delete_tools(["T2"], "Admin")
+        insert_tool(self.dm, "T3")
+        self.replica.refresh(self.dm.con, (1, 0, 1))
+        self.assertEqual(self._local("SELECT id, bin_location FROM tools ORDER BY id"), [("T1", "Garage"), ("T3", "Shelf")])
+        self.assertEqual(self._local("SELECT count(*) FROM tool_history"), [(2,)])
+
+    def test_full_copy_rebuilds_indexes(self):
+        replica = ReadReplica(':memory:', indexes=data_manager.INDEXES)
+        replica.refresh(self.dm.con, (0, 0, 0))
+        names = {r[0] for r in replica.con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+        self.assertEqual(names, set(data_manager.INDEXES))
+
+    def test_failed_sync_keeps_serving_last_copy(self):
+        self.replica.refresh(self.dm.con, (0, 0, 0))
+        broken = MagicMock()
+        broken.execute.side_effect = duckdb.IOException("network down")
+        self.assertTrue(self.replica.refresh(broken, (1, 0, 0)))
+        self.assertIn("network down", self.replica.last_error)
+        self.assertEqual(self._local("SELECT count(*) FROM tools"), [(2,)])
+
+class TestSessionCache(unittest.TestCase):
+    def setUp(self):
+        self.dm = make_local_dm()
+        self.dm.con.execute("INSERT INTO family VALUES ('Alice', 'ADULT', 'Main House', 'alice@example.com')")
+        self.token = self.dm.create_session("alice@example.com")
+
+    def test_repeat_lookups_skip_the_database(self):
+        user = self.dm.get_user_from_session(self.token)
+        self.assertEqual(user, {"name": "Alice", "role": "ADULT", "household": "Main House"})
+        with patch.object(self.dm, 'cursor') as cursor:
+            self.assertEqual(self.dm.get_user_from_session(self.token), user)
+            cursor.assert_not_called()
+
+    def test_revoke_evicts_cached_token(self):
+        self.dm.get_user_from_session(self.token)
+        self.dm.revoke_session(self.token)
+        self.assertIsNone(self.dm.get_user_from_session(self.token))
+
+    def test_expired_session_is_not_served(self):
+        self.dm.con.execute("UPDATE sessions SET expires_at = current_timestamp - INTERVAL '1 minute'")
+        self.assertIsNone(self.dm.get_user_from_session(self.token))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import threading
+import duckdb
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.db_pool import CursorPool
+
+
+class TestCursorPool(unittest.TestCase):
+    def setUp(self):
+        self.con = duckdb.connect(':memory:')
+        self.con.execute("CREATE TABLE t AS SELECT range AS x FROM range(1000)")
+
+    def test_concurrent_leases_stay_within_pool_size(self):
+        pool = CursorPool(self.con, size=2)
+        results, errors = [], []
+
+        def worker():
+            try:
+                with pool.lease() as cur:
+                    results.append(cur.execute("SELECT sum(x) FROM t").fetchone()[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [499500] * 8)
+        stats = pool.stats()
+        self.assertEqual(stats["leases"], 8)
+        self.assertLessEqual(stats["cursors"], 2)
+
+    def test_nested_lease_reuses_the_thread_cursor(self):
+        pool = CursorPool(self.con, size=1, timeout=1)
+        with pool.lease() as outer:
+            with pool.lease() as inner:
+                self.assertIs(outer, inner)
+        self.assertEqual(pool.stats()["leases"], 1)
+
+    def test_setup_runs_on_new_cursors(self):
+        self.con.execute("ATTACH ':memory:' AS other")
+        pool = CursorPool(self.con, size=1, setup=lambda cur: cur.execute("USE other"))
+        with pool.lease() as cur:
+            self.assertEqual(cur.execute("SELECT current_database()").fetchone()[0], "other")
+
+    def test_exhausted_pool_times_out(self):
+        pool = CursorPool(self.con, size=1, timeout=0.05)
+        held, release = threading.Event(), threading.Event()
+
+        def holder():
+            with pool.lease():
+                held.set()
+                release.wait()
+
+        t = threading.Thread(target=holder)
+        t.start()
+        held.wait()
+        with self.assertRaises(TimeoutError):
+            with pool.lease():
+                pass
+        release.set()
+        t.join()
+
+if __name__ == '__main__':
+    unittest.main()
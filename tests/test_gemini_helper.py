@@ -0,0 +1,144 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import threading
+import pandas as pd
+import duckdb  # Imported before the streamlit mock so patch.dict doesn't unload its submodules
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock streamlit before importing gemini_helper (the cached inner helpers become mocks we can inspect)
+with patch.dict(sys.modules, {'streamlit': MagicMock()}):
+    from core import gemini_helper, prompt_context
+from core.ai_cache import ResponseStore
+
+
+class TestCacheKeys(unittest.TestCase):
+    def setUp(self):
+        self.tools = pd.DataFrame({
+            'id': ['T1', 'T2'], 'name': ['Drill', 'Saw'], 'brand': ['Makita', 'DeWalt'],
+            'capabilities': ['holes', 'cuts'], 'bin_location': ['Shelf', 'Garage'],
+        })
+        gemini_helper._ai_filter_inventory.reset_mock()
+
+    def key(self, query, df):
+        gemini_helper.ai_filter_inventory(query, df)
+        args = gemini_helper._ai_filter_inventory.call_args.args
+        return args[:2]
+
+    def test_key_ignores_whitespace_and_unused_columns(self):
+        first = self.key("  cordless   drill ", self.tools)
+        moved = self.tools.assign(bin_location=['Garage', 'Shelf'])
+        self.assertEqual(self.key("cordless drill", moved), first)
+        self.assertEqual(first[0], "cordless drill")
+
+    def test_key_changes_with_prompt_rows(self):
+        first = self.key("drill", self.tools)
+        renamed = self.tools.assign(name=['Hammer Drill', 'Saw'])
+        self.assertNotEqual(self.key("drill", renamed), first)
+
+    def test_only_prompt_columns_are_passed_on(self):
+        gemini_helper.ai_filter_inventory("drill", self.tools)
+        ctx = gemini_helper._ai_filter_inventory.call_args.args[2]
+        self.assertEqual(list(ctx.columns), [col for _, col in gemini_helper.FILTER_FIELDS])
+
+    def test_snapshot_rows_reuse_the_shortlist(self):
+        prompt_context.clear()
+        snap = self.tools.copy()
+        snap.attrs["snapshot"] = 1
+        with patch.object(gemini_helper, 'shortlist', side_effect=lambda q, df: df) as shortlist:
+            first = self.key("drill", snap)
+            self.assertEqual(self.key("drill", snap.copy(deep=False)), first)
+            self.assertEqual(shortlist.call_count, 1)
+            self.key("drill", snap[snap['id'] == 'T1']) # Another subset of the build
+            self.assertEqual(shortlist.call_count, 2)
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        return MagicMock(text=f"answer to {contents}", usage_metadata=MagicMock(prompt_token_count=7))
+
+    def get(self, model):
+        return {"name": model}
+
+
+class TestSharedClient(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock(models=FakeModels())
+        gemini_helper.set_client(self.client)
+        gemini_helper._store = ResponseStore(":memory:")
+
+    def tearDown(self):
+        gemini_helper.set_client(None)
+        gemini_helper._store = None
+
+    def test_client_is_built_once(self):
+        gemini_helper.set_client(None)
+        with patch.object(gemini_helper, '_new_client', return_value=self.client) as new:
+            self.assertIs(gemini_helper.get_client(), gemini_helper.get_client())
+        self.assertEqual(new.call_count, 1)
+
+    def test_fake_client_serves_calls_and_store_answers_repeats(self):
+        self.assertEqual(gemini_helper.generate_text("hi"), "answer to hi")
+        self.assertEqual(gemini_helper.generate_text("hi"), "answer to hi")
+        self.assertEqual(self.client.models.calls, 1)
+
+    def test_malformed_json_is_not_stored(self):
+        self.assertEqual(gemini_helper.run_genai_query("{broken", expected_json=True), {}) # Answer: 'answer to {broken'
+        self.assertEqual(gemini_helper.run_genai_query("{broken", expected_json=True), {})
+        self.assertEqual(self.client.models.calls, 2)
+        self.assertEqual(gemini_helper._store.stats()["entries"], 0)
+
+    def test_health_check(self):
+        self.assertTrue(gemini_helper.client_health()['ok'])
+        self.client.models.get = MagicMock(side_effect=RuntimeError("timeout"))
+        self.assertTrue(gemini_helper.client_health()['ok']) # Reused within HEALTH_TTL
+        self.assertEqual(gemini_helper.client_health(force=True)['error'], "timeout")
+
+
+class TestAddToolPipeline(unittest.TestCase):
+    def setUp(self):
+        self.house = pd.DataFrame({
+            'id': ['T1', 'T2'], 'name': ['Cordless Drill', 'Shop Vac'], 'brand': ['DeWalt', 'Ridgid'],
+            'model_no': ['DCD777D1', 'WD1450'], 'owner': ['Ann', 'Ann'],
+        })
+
+    def test_local_precheck(self):
+        self.assertEqual(gemini_helper.likely_duplicates("DEWALT drill DCD777D1", self.house)['id'].tolist(), ['T1'])
+        self.assertEqual(gemini_helper.likely_duplicates("Ridgid wet/dry shop vacuum, 14 gallon, model WD1450.", self.house)['id'].tolist(), ['T2'])
+        self.assertTrue(gemini_helper.likely_duplicates("Hedge trimmer", self.house).empty)
+
+    def test_parse_and_duplicate_check_overlap(self):
+        both_running = threading.Barrier(2, timeout=5) # Each call waits for the other: only passes if concurrent
+        def parse(text):
+            both_running.wait()
+            return {"name": "Drill"}
+        def check(tool, df):
+            both_running.wait()
+            return {"is_duplicate": True, "match_name": df['name'].iloc[0]}
+        progress = []
+        with patch.object(gemini_helper, 'ai_parse_tool', side_effect=parse), \
+             patch.object(gemini_helper, 'check_duplicate_tool', side_effect=check):
+            ai_data, dup = gemini_helper.analyze_new_tool("DeWalt drill DCD777D1", self.house,
+                                                          on_progress=lambda f, text: progress.append(f))
+        self.assertEqual((ai_data, dup['match_name']), ({"name": "Drill"}, 'Cordless Drill'))
+        self.assertEqual(progress[-1], 1.0)
+
+    def test_model_check_runs_without_a_local_match(self):
+        house = pd.concat([self.house, pd.DataFrame({'id': ['T3'], 'name': ['Hammer Drill'], 'brand': ['Milwaukee'],
+                                                     'model_no': [None], 'owner': ['Bob']})], ignore_index=True)
+        text = "Milwaukee M18 FUEL 1/2 in. hammer drill/driver kit"
+        with patch.object(gemini_helper, 'ai_parse_tool', return_value={"name": "Hammer Drill"}), \
+             patch.object(gemini_helper, 'check_duplicate_tool', return_value={"is_duplicate": True}) as check:
+            self.assertEqual(gemini_helper.analyze_new_tool(text, house)[1], {"is_duplicate": True})
+        check.assert_called_once()
+        self.assertIn('T3', check.call_args.args[1]['id'].tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.prompt_budget import CHARS_PER_TOKEN, UsageLog, decode_ids, encode_tools, estimate_tokens
+from core import prompt_context
+
+FIELDS = (("ID", "id"), ("Name", "name"))
+HOUSE = ("House", "household")
+
+
+class TestEncodeTools(unittest.TestCase):
+    def setUp(self):
+        prompt_context.clear()
+        self.tools = pd.DataFrame({
+            'id': ['uuid-a', 'uuid-b', 'uuid-c'], 'name': ['Drill', 'Saw|Blade', 'Vac'],
+            'household': ['Main', 'Cabin', 'Main'],
+        })
+
+    def test_compact_table_with_aliases(self):
+        enc = encode_tools(self.tools, FIELDS)
+        self.assertEqual(enc.text, "ID | Name\nT1 | Drill\nT2 | Saw/Blade\nT3 | Vac\n")
+        self.assertEqual(enc.aliases, {'T1': 'uuid-a', 'T2': 'uuid-b', 'T3': 'uuid-c'})
+        self.assertEqual(decode_ids(['T3', 'T1', 'nope'], enc.aliases), ['uuid-c', 'uuid-a', 'nope'])
+        self.assertEqual(decode_ids('T2', enc.aliases), 'uuid-b')
+
+    def test_group_column_written_once(self):
+        enc = encode_tools(self.tools, FIELDS, group_by=HOUSE)
+        self.assertEqual(enc.text, "ID | Name\n[House: Main]\nT1 | Drill\nT3 | Vac\n[House: Cabin]\nT2 | Saw/Blade\n")
+
+    def test_budget_keeps_the_best_rows(self):
+        enc = encode_tools(self.tools, FIELDS, budget=30 // CHARS_PER_TOKEN)
+        self.assertEqual((enc.rows, enc.dropped), (1, 2))
+        self.assertEqual(list(enc.aliases.values()), ['uuid-a'])
+        self.assertLessEqual(enc.tokens, 30 // CHARS_PER_TOKEN)
+
+    def test_cached_per_rows_and_fields(self):
+        encode_tools(self.tools, FIELDS)
+        encode_tools(self.tools.copy(), FIELDS)
+        encode_tools(self.tools, FIELDS[:1])
+        self.assertEqual(prompt_context.stats, {"hits": 1, "misses": 2})
+
+
+class TestUsageLog(unittest.TestCase):
+    def test_summary_per_label(self):
+        log = UsageLog()
+        enc = encode_tools(pd.DataFrame({'id': ['a'], 'name': ['Drill']}), FIELDS)
+        log.record("filter", "x" * 40, [enc])
+        log.record("filter", "x" * 80, [enc], from_store=True)
+        row = log.summary().loc["filter"]
+        self.assertEqual((row["calls"], row["max_tokens"], row["cached"]), (2, 20, 0.5))
+        self.assertEqual(estimate_tokens(""), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.prompt_context import cached, fingerprint
+from core import prompt_context
+
+
+class TestPromptContext(unittest.TestCase):
+    def setUp(self):
+        prompt_context.clear()
+        self.tools = pd.DataFrame({'id': ['T1', 'T2'], 'name': ['Drill', 'Saw'], 'brand': ['Makita', None]})
+
+    def test_built_once_per_key(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return "text"
+        key = ("lines", fingerprint(self.tools, ['id', 'name']))
+        self.assertEqual(cached(key, build), "text")
+        self.assertEqual(cached(("lines", fingerprint(self.tools.copy(), ['id', 'name'])), build), "text")
+        self.assertEqual((len(builds), prompt_context.stats), (1, {"hits": 1, "misses": 1}))
+
+    def test_least_recently_used_renders_are_dropped(self):
+        for i in range(prompt_context.MAX_CACHED + 1):
+            cached(("k", i), lambda: "x")
+        self.assertEqual(len(prompt_context._cache), prompt_context.MAX_CACHED)
+        self.assertNotIn(("k", 0), prompt_context._cache)
+
+    def test_fingerprint_ignores_other_columns(self):
+        moved = self.tools.assign(brand=['Bosch', 'Bosch'])
+        self.assertEqual(fingerprint(self.tools, ['id', 'name']), fingerprint(moved, ['id', 'name']))
+        self.assertNotEqual(fingerprint(self.tools, ['id', 'brand']), fingerprint(moved, ['id', 'brand']))
+        self.assertNotEqual(fingerprint(self.tools, ['id', 'name']), fingerprint(self.tools[::-1], ['id', 'name']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import pandas as pd
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.retrieval import ToolRetriever
+
+
+def tools(names):
+    return pd.DataFrame({
+        'id': [f"T{i}" for i in range(len(names))],
+        'name': names,
+        'brand': ['Makita'] * len(names),
+        'capabilities': [None] * len(names),
+    })
+
+
+class TestToolRetriever(unittest.TestCase):
+    def setUp(self):
+        self.retriever = ToolRetriever()
+        self.df = tools(["Circular Saw", "Cordless Drill", "Shop Vacuum", "Hedge Trimmer", "Miter Saw", "Socket Set"])
+
+    def test_top_k_ranks_by_similarity(self):
+        top = self.retriever.top_k("need a saw for cutting", self.df, k=2)
+        self.assertEqual(set(top['id']), {'T0', 'T4'})
+        self.assertEqual(self.retriever.top_k("drill", self.df, k=1)['id'].tolist(), ['T1'])
+
+    def test_char_ngrams_tolerate_typos(self):
+        self.assertEqual(self.retriever.top_k("vaccum", self.df, k=1)['id'].tolist(), ['T2'])
+
+    def test_small_frames_pass_through(self):
+        self.assertIs(self.retriever.top_k("anything", self.df, k=10), self.df)
+        self.assertEqual(self.retriever.vectorized, 0)
+
+    def test_sync_only_revectorizes_changed_rows(self):
+        self.retriever.sync(self.df)
+        self.assertEqual(self.retriever.vectorized, 6)
+        self.retriever.sync(self.df)
+        self.assertEqual(self.retriever.vectorized, 6)
+
+        edited = self.df.copy()
+        edited.loc[5, 'name'] = 'Impact Driver'
+        self.retriever.sync(edited)
+        self.assertEqual(self.retriever.vectorized, 7)
+        self.assertEqual(self.retriever.top_k("impact driver", edited, k=1)['id'].tolist(), ['T5'])
+
+    def test_complete_sync_drops_missing_tools(self):
+        self.retriever.sync(self.df)
+        self.retriever.sync(self.df[self.df['id'] != 'T2'], complete=True)
+        self.assertNotIn('T2', self.retriever.scores("vacuum").index)
+        self.retriever.remove(['T3'])
+        self.assertEqual(len(self.retriever.scores("saw")), 4)
+
+    def test_synced_snapshot_frames_are_skipped(self):
+        self.df.attrs["snapshot"] = 7
+        self.retriever.sync(self.df, complete=True)
+        edited = self.df.copy()
+        edited.loc[5, 'name'] = 'Impact Driver' # Same token: taken as the synced build
+        self.retriever.sync(edited)
+        self.assertEqual(self.retriever.vectorized, 6)
+        edited.attrs["snapshot"] = 8
+        self.retriever.sync(edited)
+        self.assertEqual(self.retriever.vectorized, 7)
+
+    def test_only_rows_of_the_given_frame_are_returned(self):
+        self.retriever.sync(self.df)
+        subset = self.df[self.df['id'] != 'T0']
+        self.assertEqual(self.retriever.top_k("circular saw", subset, k=1)['id'].tolist(), ['T4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
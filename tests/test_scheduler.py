@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import scheduler
+from core.scheduler import MaintenanceScheduler
+
+
+class TestMaintenanceScheduler(unittest.TestCase):
+    def setUp(self):
+        self.lock_path = os.path.join(tempfile.mkdtemp(), "maintenance.lock")
+
+    def test_due_jobs_run_and_record_stats(self):
+        calls = []
+        sched = MaintenanceScheduler(lock_path=None)
+        sched.add("ok", lambda: calls.append("ok"), interval=60, delay=0)
+        sched.add("later", lambda: calls.append("later"), interval=60)
+        sched.add("broken", lambda: 1 / 0, interval=60, delay=0)
+
+        self.assertEqual(sorted(sched.run_pending()), ["broken", "ok"])
+        self.assertEqual(calls, ["ok"])
+        stats = sched.stats()
+        self.assertEqual((stats["ok"]["runs"], stats["ok"]["failures"]), (1, 0))
+        self.assertEqual(stats["broken"]["failures"], 1)
+        self.assertIn("division by zero", stats["broken"]["last_error"])
+        self.assertIsNotNone(stats["ok"]["last_duration_ms"])
+        self.assertGreater(stats["ok"]["next_in_s"], 50) # Rescheduled one jittered interval out
+        self.assertEqual(sched.run_pending(), [])
+
+    def test_only_one_scheduler_holds_the_lock(self):
+        if scheduler.fcntl is None: self.skipTest("flock not available")
+        first, second = MaintenanceScheduler(lock_path=self.lock_path), MaintenanceScheduler(lock_path=self.lock_path)
+        self.assertTrue(first._holds_lock())
+        self.assertFalse(second._holds_lock())
+        first.stop() # Releases the lock
+        self.assertTrue(second._holds_lock())
+        second.stop()
+
+    def test_local_jobs_run_without_the_lock(self):
+        if scheduler.fcntl is None: self.skipTest("flock not available")
+        calls = []
+        worker = MaintenanceScheduler(lock_path=self.lock_path)
+        self.assertTrue(worker._holds_lock())
+        other = MaintenanceScheduler(lock_path=self.lock_path)
+        other.add("warm", lambda: calls.append("warm"), interval=60, delay=0, local=True)
+        other.add("archive", lambda: calls.append("archive"), interval=60, delay=0)
+        self.assertFalse(other._holds_lock())
+        self.assertEqual(other.run_pending(local_only=True), ["warm"])
+        self.assertEqual(calls, ["warm"])
+        worker.stop()
+
+    def test_background_thread_runs_jobs(self):
+        calls = []
+        sched = MaintenanceScheduler(lock_path=self.lock_path, tick=0.05)
+        sched.add("tick", lambda: calls.append(1), interval=0.01, delay=0)
+        sched.start()
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sched.stop()
+        self.assertTrue(calls)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+import duckdb
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.replica import fetch_arrow
+from core.search import ToolSearchIndex, _terms
+
+
+class TestToolSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.con = duckdb.connect(':memory:')
+        self.con.execute("""
+            CREATE TABLE tools AS SELECT * FROM (VALUES
+                ('T1', 'Circular Saw', 'DeWalt', 'cuts wood and plywood'),
+                ('T2', 'Drill', 'Makita', 'drills holes, drives screws'),
+                ('T3', 'Miter Saw', 'Makita', 'angled cuts'),
+                ('T4', 'Shop Vac', 'Ridgid', NULL)
+            ) t(id, name, brand, capabilities)""")
+        self.table = fetch_arrow(self.con.execute("SELECT * FROM tools"))
+        self.index = ToolSearchIndex()
+
+    def test_ranked_multi_term_matches(self):
+        hits = self.index.search(self.table, "makita saws")
+        self.assertEqual(set(hits['id']), {'T1', 'T2', 'T3'})
+        self.assertEqual(hits['id'].iloc[0], 'T3') # Matches both words
+        self.assertTrue(hits['score'].is_monotonic_decreasing)
+
+    def test_rebuilt_only_for_a_new_snapshot(self):
+        self.index.search(self.table, "drill")
+        self.index.search(self.table, "vac")
+        self.assertEqual(self.index.builds, 1)
+
+        self.con.execute("INSERT INTO tools VALUES ('T5', 'Hammer Drill', 'Bosch', 'masonry')")
+        self.assertEqual(len(self.index.search(self.table, "hammer")), 0)
+        newer = fetch_arrow(self.con.execute("SELECT * FROM tools"))
+        self.assertEqual(self.index.search(newer, "hammer")['id'].tolist(), ['T5'])
+        self.assertEqual(self.index.builds, 2)
+
+    def test_partial_words_match(self):
+        self.assertEqual(self.index.search(self.table, "dew")['id'].tolist(), ['T1'])
+        self.assertEqual(self.index.search(self.table, "circ")['id'].tolist(), ['T1'])
+        self.assertIn('T2', self.index.search(self.table, "dril")['id'].tolist())
+
+    def test_bm25_ranking_keeps_partial_matches(self):
+        try:
+            duckdb.connect(':memory:').execute("LOAD fts")
+        except duckdb.Error:
+            self.skipTest("fts extension not installed")
+        self.assertTrue(self.index.prepare())
+        hits = self.index.search(self.table, "makita saws")
+        self.assertTrue(self.index.fts)
+        self.assertEqual(hits['id'].iloc[0], 'T3')
+        self.assertTrue(hits['score'].is_monotonic_decreasing)
+        self.assertEqual(self.index.search(self.table, "dew")['id'].tolist(), ['T1'])
+
+    def test_blank_query_matches_nothing(self):
+        self.assertTrue(self.index.search(self.table, "  ").empty)
+        self.assertEqual(self.index.builds, 0)
+
+    def test_terms_are_stemmed(self):
+        self.assertEqual(_terms("Saws sawing SAW drills"), ['saw', 'drill'])
+
+
+if __name__ == '__main__':
+    unittest.main()
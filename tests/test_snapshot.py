@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import threading
+from contextlib import contextmanager
+import duckdb
+
+# Add parent directory to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.snapshot import TableSnapshot
+
+
+class TestTableSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.con = duckdb.connect(':memory:')
+        self.con.execute("CREATE TABLE tools AS SELECT 'T' || range AS id, 'Available' AS status FROM range(3)")
+        self.snapshot = TableSnapshot("SELECT * FROM tools ORDER BY id")
+
+    @contextmanager
+    def read(self):
+        yield self.con.cursor()
+
+    def test_built_once_per_version(self):
+        first = self.snapshot.frame(self.read, 0)
+        second = self.snapshot.frame(self.read, 0)
+        self.assertEqual(self.snapshot.builds, 1)
+        self.assertIsNot(first, second)
+        self.assertIs(self.snapshot.arrow(self.read, 0), self.snapshot.arrow(self.read, 0))
+
+        self.con.execute("DELETE FROM tools WHERE id = 'T0'")
+        self.assertEqual(len(self.snapshot.frame(self.read, 0)), 3) # Same version: still the snapshot
+        self.assertEqual(len(self.snapshot.frame(self.read, 1)), 2)
+        self.assertEqual(self.snapshot.builds, 2)
+
+    def test_frames_carry_a_token_per_build(self):
+        first = self.snapshot.frame(self.read, 0)
+        token = first.attrs["snapshot"]
+        self.assertEqual(first[first['id'] != 'T0'].attrs["snapshot"], token)
+        self.assertNotEqual(self.snapshot.frame(self.read, 1).attrs["snapshot"], token)
+
+    def test_caller_edits_do_not_leak_into_the_snapshot(self):
+        mine = self.snapshot.frame(self.read, 0)
+        mine['Display'] = mine['id'] + '!'
+        mine.loc[0, 'status'] = 'Borrowed'
+        shared = self.snapshot.frame(self.read, 0)
+        self.assertNotIn('Display', shared.columns)
+        self.assertEqual(shared.loc[0, 'status'], 'Available')
+
+    def test_derived_frames_are_built_with_the_snapshot(self):
+        calls = []
+
+        def derive(df):
+            calls.append(1)
+            return df.assign(label=df['id'] + ':' + df['status'])
+
+        snapshot = TableSnapshot("SELECT * FROM tools ORDER BY id", derived={"display": derive})
+        for _ in range(3):
+            display = snapshot.frame(self.read, 0, derived="display")
+        self.assertEqual(calls, [1])
+        self.assertEqual(display['label'].tolist(), ['T0:Available', 'T1:Available', 'T2:Available'])
+        self.assertNotIn('label', snapshot.frame(self.read, 0).columns)
+
+    def test_concurrent_misses_build_once(self):
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            self.snapshot.frame(self.read, 5)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(self.snapshot.builds, 1)
+
+    def test_refresh_rebuilds_ahead_of_expiry_only_when_read(self):
+        snapshot = TableSnapshot("SELECT * FROM tools ORDER BY id", max_age=60)
+        self.assertEqual(len(snapshot.refresh(self.read, 0, margin=10)), 3) # First build
+        self.assertIsNone(snapshot.refresh(self.read, 0, margin=60))        # Nobody read it: left to expire
+        snapshot.frame(self.read, 0)
+        self.assertIsNone(snapshot.refresh(self.read, 0, margin=10))        # Read, but 60 s left
+        self.assertIsNotNone(snapshot.refresh(self.read, 0, margin=60))     # Read and would expire within the margin
+        self.assertIsNone(snapshot.refresh(self.read, 0, margin=60))        # Not read since that rebuild
+        self.assertEqual(snapshot.builds, 2)
+
+if __name__ == '__main__':
+    unittest.main()
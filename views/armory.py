@@ -1,9 +1,11 @@
 import streamlit as st
 import time
+import datetime
 import pandas as pd
-import uuid
 from core.data_manager import DataManager
-from core.gemini_helper import parse_location_update, ai_parse_tool, check_duplicate_tool, ai_find_tools_for_deletion
+from core.gemini_helper import parse_location_update, analyze_new_tool, ai_find_tools_for_deletion, get_response_store, client_health
+from core.prompt_budget import usage as ai_usage
+from views.paging import fetch_page, page_controls, page_offset
 
 
 def render_armory(dm: DataManager, current_user):
@@ -26,26 +28,18 @@ def render_armory(dm: DataManager, current_user):
             return
 
         try:
-            # We create a fresh instance or reuse 'dm' if thread-safe, 
-            # but callbacks in Streamlit can be tricky. Using the passed 'dm' should be fine 
-            # if it holds just the connection.
-            new_id = f"TOOL_{uuid.uuid4().hex[:6].upper()}"
-            
-            dm.con.execute("INSERT INTO tools VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
-                (new_id, 
-                 st.session_state['tool_name'], 
-                 st.session_state['tool_brand'], 
-                 st.session_state['tool_model'], 
-                 st.session_state['tool_power'], 
-                 st.session_state['tool_owner'], 
-                 st.session_state['tool_household'], 
-                 st.session_state['tool_bin'], 
-                 st.session_state['tool_stationary'], 
-                 'Available', None, None, 
-                 st.session_state['tool_caps'], 
-                 st.session_state['tool_safety']))
-            
-            dm.clear_cache() # Refresh Cache
+            dm.add_tool({
+                'name': st.session_state['tool_name'],
+                'brand': st.session_state['tool_brand'],
+                'model_no': st.session_state['tool_model'],
+                'power_source': st.session_state['tool_power'],
+                'owner': st.session_state['tool_owner'],
+                'household': st.session_state['tool_household'],
+                'bin_location': st.session_state['tool_bin'],
+                'is_stationary': st.session_state['tool_stationary'],
+                'capabilities': st.session_state['tool_caps'],
+                'safety_rating': st.session_state['tool_safety'],
+            }, current_user['name'])
             
             st.toast(
                 f"**💾 Tool Added**<br>**{st.session_state['tool_name']}** has been added to the registry.",
@@ -128,7 +122,6 @@ def render_armory(dm: DataManager, current_user):
                     else:
                         dm.update_tool_location(change['ID'], change['_bin'], change['_house'], current_user['name'])
                     count += 1
-                dm.clear_cache()
                 st.toast(f"**✅ Update Complete**\n\nProcessed **{count}** items.", icon="📦")
                 st.session_state['pending_moves'] = None
                 time.sleep(1)
@@ -143,13 +136,29 @@ def render_armory(dm: DataManager, current_user):
         st.caption("Directly edit tool attributes in the table below.")
         if current_user['role'] == "ADMIN":
             edit_df = dm.get_all_tools() # Cached
+            editor_filters = {}
             st.info("💡 **Admin Mode:** You are editing the entire family registry.")
         else:
             edit_df = dm.get_my_tools(current_user['name'])
+            editor_filters = {'owner': current_user['name']}
             st.info(f"💡 Editing tools owned by **{current_user['name']}**.")
 
+        # The editor only holds one page of the registry columns (not the derived display ones)
+        page_df, editor_total = fetch_page("tool_editor", lambda offset, limit: dm.query_tools(
+            editor_filters, sort='name', offset=offset, limit=limit, columns=list(dm.get_all_tools().columns)
+        ))
+        editor_offset = page_offset("tool_editor")
+        # Unsaved edits by tool id, so changing page doesn't drop them; shown again when their page is
+        pending = st.session_state.setdefault('tool_editor_pending', {})
+        editable = dm.EDITABLE_COLUMNS
+        shown_df = page_df
+        held = page_df['id'].isin(list(pending))
+        if held.any():
+            shown_df = page_df.copy()
+            edits = pd.DataFrame.from_dict(pending, orient='index')
+            shown_df.loc[held, editable] = edits.loc[page_df.loc[held, 'id'], editable].to_numpy()
         edited_tools = st.data_editor(
-            edit_df,
+            shown_df,
             column_config={
                 "id": st.column_config.TextColumn("ID", disabled=True, width="small"),
                 "status": st.column_config.TextColumn("Status", disabled=True),
@@ -157,15 +166,24 @@ def render_armory(dm: DataManager, current_user):
                 "return_date": st.column_config.DateColumn("Due Back", format="ddd, MMM D", disabled=True),
                 "owner": st.column_config.SelectboxColumn("Owner", options=ALL_OWNERS, required=True),
                 "household": st.column_config.SelectboxColumn("Household", options=ALL_HOUSEHOLDS, required=True),
-                "safety_rating": st.column_config.SelectboxColumn("Safety", options=["Open", "Supervised", "Adult Only"])
+                "safety_rating": st.column_config.SelectboxColumn("Safety", options=["Open", "Supervised", "Adult Only"]),
+                "updated_at": None # Internal sync column
             },
             hide_index=True,
-            key="tool_editor",
+            key=f"tool_editor_{editor_offset}",
             width='stretch'
         )
+        # Diffed against the stored rows, so an edit changed back is no longer pending
+        for tid in page_df['id']: pending.pop(tid, None)
+        pending.update(dm.changed_rows(edited_tools, page_df).set_index('id')[editable].to_dict('index'))
+        page_controls("tool_editor", editor_total)
+        if pending: st.caption(f"✏️ {len(pending)} edited tools not saved yet (kept across pages).")
         if st.button("💾 Save Table Changes", width="stretch"):
-            dm.batch_update_tools(edited_tools, current_user['name'])
-            st.toast("Inventory updated successfully!", icon="💾")
+            edits = pd.DataFrame.from_dict(pending, orient='index').rename_axis('id').reset_index()
+            saved = dm.batch_update_tools(edits, current_user['name']) if pending else 0 # Compared with the registry snapshot
+            pending.clear()
+            st.session_state.pop(f"tool_editor_{editor_offset}", None)
+            st.toast(f"Inventory updated successfully! ({saved} tools changed)", icon="💾")
             time.sleep(1)
             st.rerun()
 
@@ -186,11 +204,12 @@ def render_armory(dm: DataManager, current_user):
             trigger_ai = st.form_submit_button("✨ Click to Generate Details with AI", width='stretch')
 
         if trigger_ai and raw_input:
-            progress_text = "🤖 AI is analyzing your tool..."
-            my_bar = st.progress(0, text=progress_text)
-            
-            ai_data = ai_parse_tool(raw_input)
-            my_bar.progress(40, text="Parsing details...")
+            my_bar = st.progress(0, text="🤖 AI is analyzing your tool...")
+            all_inv = dm.get_all_tools() # Cached
+            target_house = OWNER_HOMES.get(quick_owner, ALL_HOUSEHOLDS[0]) if quick_owner else ALL_HOUSEHOLDS[0]
+            house_tools = all_inv[all_inv['household'] == target_house]
+            # Parse and duplicate check run side by side; the bar follows the real steps
+            ai_data, dup = analyze_new_tool(raw_input, house_tools, on_progress=lambda f, text: my_bar.progress(f, text=text))
             
             if ai_data:
                 st.session_state['tool_name'] = ai_data.get('name', '')
@@ -200,15 +219,8 @@ def render_armory(dm: DataManager, current_user):
                 st.session_state['tool_stationary'] = ai_data.get('is_stationary', False)
                 
                 # DUPLICATE CHECK
-                my_bar.progress(70, text="Checking for duplicates...")
-                all_inv = dm.get_all_tools() # Cached
-                target_house = OWNER_HOMES.get(quick_owner, ALL_HOUSEHOLDS[0]) if quick_owner else ALL_HOUSEHOLDS[0]
-                house_tools = all_inv[all_inv['household'] == target_house]
-                if not house_tools.empty:
-                    dup = check_duplicate_tool(ai_data, house_tools)
-                    if dup and dup.get('is_duplicate'):
-                        st.session_state['dup_warning'] = f"⚠️ **Possible Duplicate:** Similar to **{dup['match_name']}** already in **{target_house}** household."
-                    else: st.session_state['dup_warning'] = None
+                if dup and dup.get('is_duplicate'):
+                    st.session_state['dup_warning'] = f"⚠️ **Possible Duplicate:** Similar to **{dup.get('match_name')}** already in **{target_house}** household."
                 else: st.session_state['dup_warning'] = None
 
                 try: 
@@ -220,11 +232,8 @@ def render_armory(dm: DataManager, current_user):
                 st.session_state['tool_owner'] = final_owner
                 st.session_state['tool_household'] = OWNER_HOMES.get(final_owner, current_user['household'])
                 
-                my_bar.progress(100, text="Done!")
-                time.sleep(0.5)
                 my_bar.empty()
                 st.toast("AI Generated Details - Please Check for Accuracy.", icon="🤖")
-                time.sleep(2.5) 
                 st.rerun()
 
         if st.session_state.get('dup_warning'):
@@ -269,7 +278,8 @@ def render_armory(dm: DataManager, current_user):
         hist_tool_name = st.selectbox("Select tool to investigate:", edit_df['name'].sort_values().unique())
         if hist_tool_name:
             hist_tid = edit_df[edit_df['name'] == hist_tool_name].iloc[0]['id']
-            history = dm.get_tool_history(hist_tid)
+            include_archive = st.checkbox("Include archived records", help="Also search history moved to the Parquet archive")
+            history = dm.get_tool_history(hist_tid, include_archive=include_archive)
             if not history.empty: 
                 st.dataframe(
                     history, 
@@ -278,15 +288,87 @@ def render_armory(dm: DataManager, current_user):
                 )
             else: st.caption("No history records found.")
 
+            st.markdown("**🕰️ Point-in-Time View**")
+            with st.form("as_of_form"):
+                c_day, c_time = st.columns(2)
+                with c_day: as_of_day = st.date_input("As of", value=datetime.date.today() - datetime.timedelta(days=7), key="as_of_day")
+                with c_time: as_of_time = st.time_input("Time", value=datetime.time(23, 59), key="as_of_time")
+                if st.form_submit_button("🕰️ Show State"):
+                    # Replays history, so it runs on submit and the result is kept until the data changes
+                    as_of = datetime.datetime.combine(as_of_day, as_of_time)
+                    versions = (dm.table_version("tools"), dm.table_version("history"))
+                    st.session_state['as_of_result'] = (hist_tid, as_of, versions, dm.get_tool_as_of(hist_tid, as_of))
+            result = st.session_state.get('as_of_result')
+            if result and result[0] == hist_tid and result[2] == (dm.table_version("tools"), dm.table_version("history")):
+                _, as_of, _, then = result
+                if then is None:
+                    st.caption(f"No recorded state of **{hist_tool_name}** at that time.")
+                else:
+                    now = edit_df[edit_df['id'] == hist_tid].iloc[0]
+                    shown = lambda v: "" if v is None or pd.isna(v) else str(v)
+                    diff = pd.DataFrame([
+                        {"field": k, "then": shown(v), "now": shown(now.get(k))} for k, v in then.items() if k != 'id'
+                    ])
+                    st.dataframe(diff[diff['then'] != diff['now']] if st.checkbox("Only show differences", value=True) else diff,
+                                 hide_index=True, width="stretch")
+                st.caption("Loan check-outs aren't versioned; status and borrower reflect edits and retirements only.")
+                if st.checkbox("Show the whole registry at this time", key="as_of_all"):
+                    st.dataframe(dm.get_tools_as_of(as_of), hide_index=True, width="stretch")
+
     if current_user['role'] == "ADMIN":
         st.markdown("---")
         st.subheader("🛠️ Admin Tools")
         with st.expander("🧹 Clean Up Old Tool History", expanded=st.session_state['exp_purge']):
             st.session_state['exp_purge'] = True
-            if st.button("🧹 Purge Stuff Older than 30 Days"):
-                deleted = dm.purge_old_history(30)
-                st.toast(f"Removed {deleted} old records.", icon="🗑️")
+            if dm.archive_dir:
+                st.caption("Archived records move to compressed Parquet files and stay searchable from the audit views.")
+                if st.button("📦 Archive History Older than 30 Days"):
+                    moved = dm.purge_old_history(30)
+                    st.toast(f"Archived {moved} old records.", icon="📦")
+                if st.button("📦 Archive Security Logs Older than 90 Days"):
+                    moved = dm.archive_old_rows("audit_logs", 90)
+                    st.toast(f"Archived {moved} old log entries.", icon="📦")
+            else:
+                st.warning("Archiving is off: set the ARCHIVE_DIR secret to a durable location (e.g. an s3:// URL) to enable it.")
+            if st.button(f"🗜️ Compact History Older than {dm.HISTORY_COMPACT_DAYS} Days", help="Folds each tool's old edits into one monthly snapshot"):
+                folded = dm.compact_history()
+                st.toast(f"Folded {folded} old changes into monthly checkpoints.", icon="🗜️")
         
+        with st.expander("🔐 Security Log"):
+            c_days, c_arch = st.columns(2)
+            with c_days: log_days = st.number_input("Days to show", min_value=1, max_value=3650, value=7)
+            with c_arch: log_archive = st.checkbox("Include archived logs", key="log_archive")
+            if st.toggle("Load log", key="log_load"): # Expander bodies run on every rerun; only query on demand
+                st.dataframe(
+                    dm.get_audit_logs(log_days, include_archive=log_archive),
+                    column_config={"timestamp": st.column_config.DatetimeColumn("Time", format="D MMM, h:mm a")},
+                    hide_index=True, width="stretch"
+                )
+
+        with st.expander("🩺 Background Maintenance"):
+            jobs = dm.maintenance_stats()
+            if jobs:
+                st.dataframe(pd.DataFrame.from_dict(jobs, orient="index"), width="stretch")
+            else: st.caption("The maintenance scheduler isn't running in this process.")
+            ai = get_response_store().stats()
+            hit_rate = f"{ai['hit_rate']:.0%}" if ai['hit_rate'] is not None else "n/a"
+            st.caption(f"🤖 AI response cache: {ai['entries']} answers ({ai['bytes'] / 1e6:.1f} MB), "
+                       f"{ai['hits']} hits / {ai['misses']} misses ({hit_rate}), {ai['evictions']} evicted")
+            prompt_usage = ai_usage.summary()
+            if not prompt_usage.empty:
+                st.caption("Prompt size per AI helper (estimated tokens; rows sent and rows cut to stay in budget):")
+                st.dataframe(prompt_usage, width="stretch")
+            c_clear, c_health = st.columns(2)
+            with c_clear:
+                if st.button("Clear AI Response Cache"):
+                    get_response_store().clear()
+                    st.toast("AI response cache cleared.", icon="🧹")
+            with c_health:
+                if st.button("Check AI Connection"):
+                    health = client_health(force=True)
+                    if health['ok']: st.success(f"Gemini reachable ({health['latency_ms']:.0f} ms)")
+                    else: st.error(f"Gemini unreachable: {health['error']}")
+
         st.markdown("---")
         with st.expander("🗑️ The Tool Incinerator (Admin Only)", expanded=st.session_state['exp_incin']):
             st.session_state['exp_incin'] = True
@@ -313,8 +395,7 @@ def render_armory(dm: DataManager, current_user):
                     with c_burn:
                         # Use a unique key for safety
                         if st.button(f"Incinerate {count} Ghost Tools", type="primary", key="burn_ghosts_btn"):
-                            for tid in ghosts['id'].tolist():
-                                dm.delete_tool(tid, current_user['name'])
+                            dm.delete_tools(ghosts['id'].tolist(), current_user['name'])
                             st.toast(f"Incinerated {count} ghost tools.", icon="🔥")
                             st.session_state['ghost_scan_active'] = False # Reset
                             time.sleep(1)
@@ -353,23 +434,28 @@ def render_armory(dm: DataManager, current_user):
                 st.rerun()
 
             # 2. Data Table
-            all_tools_del = dm.get_all_tools()
-            
             # Apply Filter if exists
+            incin_filters = {}
             if st.session_state['incin_filter_ids']:
-                display_df = all_tools_del[all_tools_del['id'].isin(st.session_state['incin_filter_ids'])]
-                st.info(f"🤖 AI found {len(display_df)} matches.")
-            else:
-                display_df = all_tools_del
+                incin_filters['id'] = st.session_state['incin_filter_ids']
+            display_df, incin_total = fetch_page("incinerator", lambda offset, limit: dm.query_tools(
+                incin_filters, sort='name', offset=offset, limit=limit,
+                columns=['id', 'name', 'brand', 'owner', 'household', 'status']
+            ))
+            if incin_filters:
+                st.info(f"🤖 AI found {incin_total} matches.")
             
-            # Selectable Dataframe
+            # Selectable Dataframe (one page; the key changes with it so selections don't carry over)
+            incin_offset = page_offset("incinerator")
             selection = st.dataframe(
                 display_df[['name', 'brand', 'owner', 'household', 'status']],
                 width='stretch',
                 hide_index=True,
                 on_select="rerun",
-                selection_mode="multi-row"
+                selection_mode="multi-row",
+                key=f"incinerator_table_{incin_offset}"
             )
+            page_controls("incinerator", incin_total)
             
             # 3. Action Button
             selected_rows = selection.selection.rows
@@ -383,10 +469,8 @@ def render_armory(dm: DataManager, current_user):
                 st.warning(f"You have selected {count} tools to **incinerate**.")
                 
                 if st.button(f"Incinerate {count} Selected Tools", type="primary"):
-                    success_c = 0
-                    for tid in selected_ids:
-                        dm.delete_tool(tid, current_user['name'])
-                        success_c += 1
+                    dm.delete_tools(selected_ids, current_user['name'])
+                    success_c = len(selected_ids)
                     
                     st.toast(f"Destroyed {success_c} tools.", icon="🔥")
                     st.session_state['incin_filter_ids'] = None # Reset
@@ -2,6 +2,9 @@ import streamlit as st
 import time
 from core.gemini_helper import ai_filter_inventory
 from core.tools_registry import check_safety
+from views.paging import fetch_page, page_controls
+
+SORT_OPTIONS = {"Relevance": None, "Name": "name", "Brand": "brand", "Status": "Display Status", "Location": "Location Info", "Due Back": "return_date"}
 
 
 def render_arsenal(dm, current_user):
@@ -17,45 +20,34 @@ def render_arsenal(dm, current_user):
     with c2:
         use_ai = st.toggle("AI Search", value=True)
 
-    # CACHED QUERY
-    all_tools = dm.get_all_tools() 
-    filtered_df = all_tools.copy()
+    # Shared snapshot with Location Info / Display Status already derived (once per registry version)
+    all_tools = dm.get_display_tools()
+    filters = {}
     
     if query:
         if use_ai:
             with st.spinner("AI is filtering..."):
-                match_ids = ai_filter_inventory(query, all_tools)
-                filtered_df = all_tools[all_tools['id'].isin(match_ids)].copy()
+                filters['id'] = ai_filter_inventory(query, all_tools)
         else:
-            mask = (
-                all_tools['name'].str.contains(query, case=False, na=False) | 
-                all_tools['brand'].str.contains(query, case=False, na=False) |
-                all_tools['capabilities'].str.contains(query, case=False, na=False)
-            )
-            filtered_df = all_tools[mask].copy()
-
-    def format_location(row):
-        loc = f"{row['household']} ({row['bin_location']})"
-        if row.get('is_stationary'): loc += " ⚓ [Fixed]"
-        return loc
-
-    filtered_df['Location Info'] = filtered_df.apply(format_location, axis=1)
-    
-    def get_status_display(row):
-        if row['status'] == 'Borrowed': return f"⛔ With {row['borrower']}"
-        return "✅ Available"
-    
-    filtered_df['Display Status'] = filtered_df.apply(get_status_display, axis=1)
+            # Ranked full-text match (index rebuilt only when the registry changes)
+            filters['id'] = dm.search_tools(query, limit=len(all_tools))['id']
 
+    sort_label = st.selectbox("Sort by", list(SORT_OPTIONS), key="arsenal_sort")
+    # Only the visible page of these columns is sent to the browser
+    page_df, total = fetch_page("arsenal", lambda offset, limit: dm.query_tools(
+        filters, sort=SORT_OPTIONS[sort_label], offset=offset, limit=limit,
+        columns=['name', 'brand', 'Display Status', 'Location Info', 'return_date']
+    ))
     st.dataframe(
-        filtered_df[['name', 'brand', 'Display Status', 'Location Info', 'return_date']],
+        page_df,
         column_config={"return_date": st.column_config.DatetimeColumn("Due Back", format="ddd, MMM D")},
-        width='stretch'
+        width='stretch', hide_index=True
     )
+    page_controls("arsenal", total)
 
     st.markdown("---")
     st.subheader("⚡ Quick Borrow")
-    available_only = all_tools[(all_tools['status'] == 'Available') & (all_tools['is_stationary'] != True)]
+    available_only = all_tools[(all_tools['status'] == 'Available') & all_tools['transportable']]
     
     if not available_only.empty:
         with st.form("manual_borrow"):
@@ -68,10 +60,12 @@ def render_arsenal(dm, current_user):
             if st.form_submit_button("Confirm Borrow"):
                 tool_row = available_only[available_only['name'] == target_tool_name].iloc[0]
                 if check_safety(current_user['role'], tool_row['safety_rating']):
-                    dm.borrow_tool(tool_row['id'], current_user['name'], days)
-                    st.success(f"✅ You borrowed the {target_tool_name}!")
-                    time.sleep(1.5)
-                    st.rerun()
+                    if dm.borrow_tool(tool_row['id'], current_user['name'], days):
+                        st.success(f"✅ You borrowed the {target_tool_name}!")
+                        time.sleep(1.5)
+                        st.rerun()
+                    else:
+                        st.error(f"⚠️ The {target_tool_name} is no longer available.")
                 else:
                     st.error("🚫 Safety Restriction.")
     else:
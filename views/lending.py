@@ -93,15 +93,17 @@ def render_lending(dm, current_user):
                     
                     if st.form_submit_button("Confirm Borrow Request", width='stretch'):
                         if selected_tools:
-                            success_count = 0
+                            allowed_ids = []
                             for t_name in selected_tools:
                                 tool_row = available_only[available_only['name'] == t_name].iloc[0]
                                 if check_safety(current_user['role'], tool_row['safety_rating']):
-                                    dm.borrow_tool(tool_row['id'], current_user['name'], days_needed)
-                                    success_count += 1
+                                    allowed_ids.append(tool_row['id'])
                                 else:
                                     st.error(f"🚫 Safety Restriction on {t_name}")
                             
+                            outcomes = dm.borrow_tools(allowed_ids, current_user['name'], days_needed)
+                            success_count = sum(outcomes.values())
+                            
                             if success_count > 0:
                                 st.toast(f"✅ Successfully borrowed {success_count} tools!", icon="🚚")
                                 st.session_state['borrow_stage'] = 'manual'
@@ -258,15 +260,17 @@ def render_lending(dm, current_user):
                     elif requires_override and not authorized:
                         st.error("You must authorize the safety override to proceed.")
                     else:
-                        success_count = 0
-                        for t_name in selected_tool_names:
-                            tid = lending_pool[lending_pool['name'] == t_name].iloc[0]['id']
-                            dm.borrow_tool(tid, borrower, days)
-                            success_count += 1
+                        tids = [lending_pool[lending_pool['name'] == t_name].iloc[0]['id'] for t_name in selected_tool_names]
+                        outcomes = dm.borrow_tools(tids, borrower, days)
+                        failed = [tid for tid, ok in outcomes.items() if not ok]
+                        success_count = len(outcomes) - len(failed)
                         
-                        dm.clear_cache()
-                        st.toast(f"Successfully lent {success_count} tools to {borrower}!", icon="✅")
-                        st.session_state['lend_stage'] = 'manual'
-                        st.session_state['lend_data'] = None
-                        time.sleep(1.5)
-                        st.rerun()
+                        if failed:
+                            names = lending_pool.set_index(lending_pool['id'].astype(str))['name']
+                            st.error(f"Could not lend (no longer available): {', '.join(names.get(tid, tid) for tid in failed)}")
+                        if success_count > 0:
+                            st.toast(f"Successfully lent {success_count} tools to {borrower}!", icon="✅")
+                            st.session_state['lend_stage'] = 'manual'
+                            st.session_state['lend_data'] = None
+                            time.sleep(1.5)
+                            st.rerun()
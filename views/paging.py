@@ -0,0 +1,41 @@
+import math
+import streamlit as st
+
+# paging.py
+# Server-side paging for large tool tables: only the visible page (and the
+# columns a table shows) is sent to the browser on each rerun.
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def page_offset(key, default_size=50):
+    """Row offset of the page currently shown; widgets keyed by it keep edits and selections per page."""
+    return (st.session_state.get(f"{key}_page", 1) - 1) * st.session_state.get(f"{key}_size", default_size)
+
+
+def fetch_page(key, query, default_size=50):
+    """
+    Runs query(offset, limit) -> (DataFrame, total) for the page picked in this table's controls.
+
+    Call before rendering the table, then call page_controls() below it.
+    """
+    size = st.session_state.get(f"{key}_size", default_size)
+    page = st.session_state.get(f"{key}_page", 1)
+    df, total = query(page_offset(key, default_size), size)
+    last = max(1, math.ceil(total / size))
+    if page > last: # A filter shrank the result; show its last page
+        st.session_state[f"{key}_page"] = page = last
+        df, total = query((page - 1) * size, size)
+    return df, total
+
+
+def page_controls(key, total, default_size=50):
+    """Page size and page number pickers for a table fetched with fetch_page()."""
+    size = st.session_state.get(f"{key}_size", default_size)
+    pages = max(1, math.ceil(total / size))
+    page = min(st.session_state.get(f"{key}_page", 1), pages)
+    first = (page - 1) * size + 1 if total else 0
+    c_info, c_size, c_page = st.columns([3, 1, 1], vertical_alignment="bottom")
+    with c_info: st.caption(f"Showing {first}–{min(page * size, total)} of {total} tools")
+    with c_size: st.selectbox("Rows", PAGE_SIZES, index=PAGE_SIZES.index(default_size), key=f"{key}_size")
+    with c_page: st.number_input("Page", min_value=1, max_value=pages, key=f"{key}_page") # Clamped by fetch_page
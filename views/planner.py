@@ -61,9 +61,11 @@ def render_planner(dm, current_user):
                 days = st.number_input("Days needed:", min_value=1, value=7)
                 if st.form_submit_button("Confirm Borrow Request"):
                     if selected_ids:
-                        for tid in selected_ids:
-                            dm.borrow_tool(tid, current_user['name'], days)
-                        st.success("Tools borrowed!")
+                        outcomes = dm.borrow_tools(selected_ids, current_user['name'], days)
+                        unavailable = [tid for tid, ok in outcomes.items() if not ok]
+                        st.success(f"Borrowed {len(outcomes) - len(unavailable)} tools!")
+                        if unavailable:
+                            st.warning(f"{len(unavailable)} tools were no longer available.")
                         st.session_state["ai_recs"] = None
                         time.sleep(2)
                         st.rerun()
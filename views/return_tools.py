@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import time
 from core.gemini_helper import parse_return_request
 
@@ -7,7 +6,7 @@ def render_return_tools(dm, current_user):
     st.header("🪃 Return Tools")
     
     # 1. Fetch Data
-    all_tools = dm.get_all_tools() # Cached
+    all_tools = dm.get_display_tools() # Shared snapshot with due status precomputed
     my_loans = all_tools[all_tools['borrower'] == current_user['name']]
     my_assets = all_tools[(all_tools['owner'] == current_user['name']) & (all_tools['status'] == 'Borrowed')]
 
@@ -43,10 +42,8 @@ def render_return_tools(dm, current_user):
             
             c_y, c_n = st.columns(2)
             if c_y.button("✅ Confirm & Process"):
-                count = 0
-                for tid in ids:
-                    dm.return_tool(tid)
-                    count += 1
+                outcomes = dm.return_tools(ids)
+                count = sum(outcomes.values())
                 st.success(f"Processed {count} items!")
                 st.session_state['return_ids'] = None
                 st.session_state['return_intent'] = None
@@ -77,17 +74,10 @@ def render_return_tools(dm, current_user):
     if view_mode == "Borrowed":
         st.subheader("🛠️ I Borrowed")
         if not my_loans.empty:
-            my_loans['Due In'] = (pd.to_datetime(my_loans['return_date']) - pd.Timestamp.now()).dt.days
-            def color_status(days):
-                if days < 0: return "🔴 Overdue"
-                if days <= 2: return "🟠 Due Soon"
-                return "🟢 On Track"
-            my_loans['Status'] = my_loans['Due In'].apply(color_status)
-
             # Updated for Multi-Select
             event_borrow = st.dataframe(
-                my_loans[['name', 'brand', 'return_date', 'Status']], 
-                column_config={"return_date": st.column_config.DateColumn("Return Date", format="MMM D")},
+                my_loans[['name', 'brand', 'return_date', 'Due Status']], 
+                column_config={"return_date": st.column_config.DateColumn("Return Date", format="MMM D"), "Due Status": "Status"},
                 width="stretch",
                 hide_index=True,
                 on_select="rerun",
@@ -100,8 +90,7 @@ def render_return_tools(dm, current_user):
                 selected_rows = my_loans.iloc[selected_indices]
                 st.info(f"Selected {len(selected_rows)} items to return.")
                 if st.button(f"✅ Return {len(selected_rows)} Tools", key="btn_ret_me_multi"):
-                    for _, row in selected_rows.iterrows():
-                        dm.return_tool(row['id'])
+                    dm.return_tools(selected_rows['id'].tolist())
                     st.success(f"Returned {len(selected_rows)} tools!")
                     time.sleep(3)
                     st.rerun()
@@ -126,8 +115,7 @@ def render_return_tools(dm, current_user):
                 selected_rows_lend = my_assets.iloc[selected_indices_lend]
                 st.info(f"Selected {len(selected_rows_lend)} items received.")
                 if st.button(f"📥 Mark {len(selected_rows_lend)} Received", key="btn_ret_own_multi"):
-                    for _, row in selected_rows_lend.iterrows():
-                        dm.return_tool(row['id'])
+                    dm.return_tools(selected_rows_lend['id'].tolist())
                     st.success(f"Marked {len(selected_rows_lend)} tools as returned.")
                     time.sleep(3)
                     st.rerun()